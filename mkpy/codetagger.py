@@ -1,8 +1,10 @@
+import os
 import re
 import yaml
 import numpy as np
 import pandas as pd
 import warnings
+from mkpy import filecache
 
 
 class CodeTagger:
@@ -198,7 +200,24 @@ class CodeTagger:
 
         # TODO: handle different filetypes, don't let things fail silently
         self.cmf = str(cmf)  # for Path
+        self._compiled_patts = dict()  # see _compile_patt()
 
+        # parse each version of a codemap file once, see mkpy.filecache
+        try:
+            with open(re.sub(r"(\.xls[xm])!.*$", r"\1", self.cmf), "rb") as f:
+                cache_key = filecache.fingerprint(
+                    "codemap", f.read(), os.path.basename(self.cmf), pd.__version__
+                )
+        except OSError:
+            cache_key = None  # the loaders report what is wrong
+
+        if cache_key is None:
+            self.code_map = self._load_map()
+        else:
+            self.code_map = filecache.get(cache_key, self._load_map)
+
+    def _load_map(self):
+        """try the xlsx, YAML, and text loaders in turn and return the code map"""
         loaders = {
             "xlsx": self._load_xlsx_map,
             "yaml": self._load_yaml_map,
@@ -216,13 +235,12 @@ class CodeTagger:
 
             # break out on success
             if code_map is not None:
-                self.code_map = code_map
-                return
+                return code_map
 
         # uh oh ...
         for fail in fails:
             print(f"failed {fail[0]}: {fail[1]}")
-        raise IOError(f"failed to load {cmf} as an xlsx, YAML, or text code map")
+        raise IOError(f"failed to load {self.cmf} as an xlsx, YAML, or text code map")
 
         self._check_mapper(self.code_map)
 
@@ -302,7 +320,7 @@ class CodeTagger:
 
         # slurp the code tags
         with open(cmf, "r") as d:
-            mapper = yaml.load(d.read(), Loader=yaml.SafeLoader)
+            mapper = yaml.load(d.read(), Loader=filecache.YAML_SAFE_LOADER)
 
         # modicum of format checking ...
         if not isinstance(mapper, dict):
@@ -451,7 +469,30 @@ class CodeTagger:
         # these are used for pattern matching and lookup in find_codes
         return (anchor, capture_groups, code_patt)
 
-    def _find_evcodes(self, pattern, ticks, evcodes):
+    def _compile_patt(self, pattern):
+        """parse and compile a search pattern once per code tagger
+
+        Returns
+        -------
+            (anchor, patt_regx, code_pattern) : tuple
+                anchor : as returned by _parse_patt()
+                patt_regx : compiled regular expression for the code string
+                code_pattern : CodePattern for the integer codes
+        """
+        if pattern not in self._compiled_patts:
+            # parse the pattern parameter into useful chunks.
+            # details in _parse_patt().__doc__
+            anchor, capture_groups, code_patt = self._parse_patt(pattern)
+            try:
+                patt_regx = re.compile(code_patt)
+            except:
+                msg = "cannot compile {0} as regular expression".format(code_patt)
+                raise TypeError(msg)
+            code_pattern = CodePattern(self._pattern_to_str(pattern))
+            self._compiled_patts[pattern] = (anchor, patt_regx, code_pattern)
+        return self._compiled_patts[pattern]
+
+    def _find_evcodes(self, pattern, ticks, evcodes, event_codes=None):
         r"""Pattern match sequences of integer codes and extract timing information
 
         This finds arbitrary subsequences of integers in a 1-D array
@@ -539,6 +580,10 @@ class CodeTagger:
             .. Note::
                A ``search pattern`` may contain capturing code
                patterns in addition to the anchor pattern
+
+        To sweep all the patterns in a code map across the same
+        ``evcodes``, pass them indexed once as ``event_codes``, see
+        EventCodes.
         """
 
         rvals = []  # return this
@@ -548,27 +593,26 @@ class CodeTagger:
             warnings.warn("list of event codes is empty")
             return rvals
 
-        # parse the pattern parameter into useful chunks.
-        # details in _parse_patt().__doc__
-        anchor, capture_groups, code_patt = self._parse_patt(pattern)
-        try:
-            patt_regx = re.compile(code_patt)
-        except:
-            msg = "cannot compile {0} as regular expression".format(code_patt)
-            raise TypeError(msg)
+        anchor, patt_regx, code_pattern = self._compile_patt(pattern)
 
-        # stringify the code list for matching against the code pattern
-        sep = " "  # the single whitespace delimiter, critical for pattern matching
-        code_str = ""
-        for e in evcodes:
-            code_str += "{0}{1}".format(sep, e)
+        # the event codes indexed once for all the patterns in a code map
+        if event_codes is None:
+            event_codes = EventCodes(evcodes)
+
+        # literal and digit code patterns match the integer codes directly
+        if code_pattern.is_vectorized:
+            return self._find_code_pattern(code_pattern, ticks, evcodes, event_codes)
+
+        # stringify the code list for matching against the code pattern, the
+        # single whitespace delimiter is critical for pattern matching
+        code_str = event_codes.code_str
 
         # sweep the pattern regular expression across the code string
         matches = [m for m in patt_regx.finditer(code_str)]
 
         # rank of the sep delimiter == event code index
         # end boundary of nth sep delimiter is right-boundary of the nth event code
-        delims = [m.end() for m in re.finditer(sep, code_str)]
+        delims = event_codes.delims.tolist()
 
         # assert len(delims)==len(evcodes) # very very bad if not
         if len(delims) != len(evcodes):
@@ -580,110 +624,95 @@ class CodeTagger:
             )
             raise ValueError(msg)
 
-        # 3. scan the string delimter values for pattern match span starts
-        for (didx, delim_at) in enumerate(delims):
+        # look up table string offset -> event code index, -1 inside codes
+        delim_idxs = np.full(len(code_str) + 1, -1, dtype=int)
+        delim_idxs[delims] = np.arange(len(delims))
+        delim_idxs = delim_idxs.tolist()
+
+        #  this index points to the anchor capture group in m.groups()
+        anchor_group_idx = anchor[0] + 1
+
+        # 3. scan the matches, in string order, for spans that start at a code
+        for m in matches:
+            didx = delim_idxs[m.start()]
+            if didx < 0:
+                continue
 
             # A search may find 0, 1, or 1+ pattern
             # match(es). If a match is found there is at least one
             # match group for the obligatory anchor and maybe more
             # if the pattern contains additional capture groups.
             # So for generality always iterate over m.groups()
-            for m in matches:
-                if delim_at == m.span()[0]:
-                    m_group_info = []
-
-                    # iterate thru the match groups in this m
-                    mgi = 1  # individual match groups start at index 1
-
-                    # copy indexes to process m's match groups
-                    # w/out disturbing didx, delim_at
-                    idx = didx
-                    dlim = delim_at
-
-                    anchor_idx, anchor_group_idx, anchor_tick = (None, None, None)
-
-                    #  this index points to the anchor capture group in m.groups()
-                    anchor_group_idx = anchor[0] + 1
-
-                    # for readability
-                    anchor_delim = m.span(anchor_group_idx)[
-                        0
-                    ]  # string offset for anchor
-                    anchor_idx = delims.index(
-                        anchor_delim
-                    )  # index in code list of anchor
-                    anchor_tick = ticks[anchor_idx]  # index into the lists
-
-                    # assert(int(m.group(anchor_group_idx)) == evcodes[anchor_idx])
-                    # confirm stringified event code sequence w/ original array
-                    if int(m.group(anchor_group_idx)) != evcodes[anchor_idx]:
-                        msg = (
-                            "uh oh, horrible bug #1 in the event code finder "
-                            "... yell at urbach"
-                        )
-                        raise ValueError(msg)
-
-                    while mgi <= m.lastindex and idx < len(evcodes):
-                        if m.start(mgi) == dlim:
-                            # scrape this match group info
-                            info = None
-
-                            # capture groups match one or more evcodes
-                            # ... make a list, possibly singleton
-                            enumevcodes = [
-                                (i, c)
-                                for i, c in enumerate(m.group(mgi).strip().split(" "))
-                            ]
-
-                            # check the slicing and dicing ...
-                            # the code (sequence) at this index must match the string pattern
-                            # assert all([c == str(evcodes[idx+i]) for i,c in enumevcodes])
-                            if any(
-                                [c != str(evcodes[idx + i]) for i, c in enumevcodes]
-                            ):
-                                msg = (
-                                    "uh oh, horrible bug #2 in the event code finder"
-                                    "... yell at urbach"
-                                )
-                                raise ValueError(msg)
-
-                            # whew ...
-                            for i, c in enumevcodes:
-                                # each info is a list of (key, value) tuples, readily
-                                # convertible something useful ... OrderedDict, pandas.Dataframe
-                                info = [
-                                    ("match_group", mgi),
-                                    ("idx", idx),
-                                    ("dlim", dlim),
-                                    ("anchor_str", m.group(anchor_group_idx)),
-                                    ("match_str", m.group(mgi)),
-                                    ("anchor_code", evcodes[anchor_idx]),
-                                    ("match_code", evcodes[idx + i]),  # evcodes[idx],
-                                    ("anchor_tick", anchor_tick),
-                                    ("match_tick", ticks[idx + i]),  # ticks[idx]
-                                    (
-                                        "anchor_tick_delta",
-                                        int(ticks[idx + i]) - int(anchor_tick),
-                                    ),
-                                    ("is_anchor", mgi == anchor_group_idx),
-                                ]
-                                m_group_info.append(info)
-                            mgi += 1
-                        idx += 1  # keep looking to the right
-                        if idx == len(evcodes):
-                            continue  # nothing else to look for, move on
-                        dlim = delims[idx]  # update delimiter
-
-                        # vestigal bounds check ...
-                        if idx > len(evcodes):
-                            msg = (
-                                "uh oh, event code list overrun horrible bug #3 in the "
-                                "event code finder ... yell at urbach"
-                            )
-                            raise ValueError(msg)
-
-                    # accumulate the data
-                    rvals.append(m_group_info)
+            m_group_info = []
+
+            # for readability
+            anchor_delim = m.start(anchor_group_idx)  # string offset for anchor
+            anchor_idx = delim_idxs[anchor_delim]  # index in code list of anchor
+            if anchor_delim < 0 or anchor_idx < 0:
+                msg = f"anchor {m.group(anchor_group_idx)} does not start at a code"
+                raise ValueError(msg)
+            anchor_tick = ticks[anchor_idx]  # index into the lists
+
+            # assert(int(m.group(anchor_group_idx)) == evcodes[anchor_idx])
+            # confirm stringified event code sequence w/ original array
+            if int(m.group(anchor_group_idx)) != evcodes[anchor_idx]:
+                msg = (
+                    "uh oh, horrible bug #1 in the event code finder "
+                    "... yell at urbach"
+                )
+                raise ValueError(msg)
+
+            # match groups are scraped left to right starting at this
+            # match, a group that does not start at a code to the right
+            # of the previous one ends the scraping
+            next_idx = didx
+            for mgi in range(1, m.lastindex + 1):
+                dlim = m.start(mgi)
+                idx = delim_idxs[dlim] if dlim >= 0 else -1
+                if idx < next_idx:
+                    break
+                next_idx = idx + 1
+
+                # capture groups match one or more evcodes
+                # ... make a list, possibly singleton
+                enumevcodes = [
+                    (i, c) for i, c in enumerate(m.group(mgi).strip().split(" "))
+                ]
+
+                # check the slicing and dicing ...
+                # the code (sequence) at this index must match the string pattern
+                # assert all([c == str(evcodes[idx+i]) for i,c in enumevcodes])
+                if any([c != str(evcodes[idx + i]) for i, c in enumevcodes]):
+                    msg = (
+                        "uh oh, horrible bug #2 in the event code finder"
+                        "... yell at urbach"
+                    )
+                    raise ValueError(msg)
+
+                # whew ...
+                for i, c in enumevcodes:
+                    # each info is a list of (key, value) tuples, readily
+                    # convertible something useful ... OrderedDict, pandas.Dataframe
+                    info = [
+                        ("match_group", mgi),
+                        ("idx", idx),
+                        ("dlim", dlim),
+                        ("anchor_str", m.group(anchor_group_idx)),
+                        ("match_str", m.group(mgi)),
+                        ("anchor_code", evcodes[anchor_idx]),
+                        ("match_code", evcodes[idx + i]),  # evcodes[idx],
+                        ("anchor_tick", anchor_tick),
+                        ("match_tick", ticks[idx + i]),  # ticks[idx]
+                        (
+                            "anchor_tick_delta",
+                            int(ticks[idx + i]) - int(anchor_tick),
+                        ),
+                        ("is_anchor", mgi == anchor_group_idx),
+                    ]
+                    m_group_info.append(info)
+
+            # accumulate the data
+            rvals.append(m_group_info)
 
         # done scanning, go home
         if len(rvals) > 0:
@@ -692,3 +721,353 @@ class CodeTagger:
             return rvals
         else:
             return None
+
+    def _find_code_pattern(self, code_pattern, ticks, evcodes, event_codes):
+        """vectorized _find_evcodes() for a CodePattern, same return values"""
+
+        _, starts = code_pattern.find(event_codes)
+        if len(starts) == 0:
+            return None
+
+        # string offsets of the codes, as the delims in _find_evcodes()
+        delims = event_codes.delims
+
+        anchor_group_idx = [g[2] for g in code_pattern.groups].index(True) + 1
+        anchor_offset = code_pattern.groups[anchor_group_idx - 1][0]
+
+        rvals = []
+        for start in starts.tolist():
+            anchor_idx = start + anchor_offset
+            anchor_str = str(evcodes[anchor_idx])
+            anchor_tick = ticks[anchor_idx]
+
+            m_group_info = []
+            for mgi, (group_start, group_stop, _) in enumerate(code_pattern.groups, 1):
+                idx = start + group_start
+                match_str = " ".join(
+                    str(evcodes[i]) for i in range(idx, start + group_stop)
+                )
+                for i in range(group_stop - group_start):
+                    info = [
+                        ("match_group", mgi),
+                        ("idx", idx),
+                        ("dlim", int(delims[idx])),
+                        ("anchor_str", anchor_str),
+                        ("match_str", match_str),
+                        ("anchor_code", evcodes[anchor_idx]),
+                        ("match_code", evcodes[idx + i]),
+                        ("anchor_tick", anchor_tick),
+                        ("match_tick", ticks[idx + i]),
+                        ("anchor_tick_delta", int(ticks[idx + i]) - int(anchor_tick)),
+                        ("is_anchor", mgi == anchor_group_idx),
+                    ]
+                    m_group_info.append(info)
+            rvals.append(m_group_info)
+
+        return rvals
+
+
+class CodePattern:
+    r"""code map regexp compiled for matching 1-D arrays of integer event codes
+
+    Code map regexps are defined by matching against the event codes
+    as a string of space-separated integers, see
+    CodeTagger._find_evcodes(). For the common case of sequences of
+    single code patterns, literal codes like ``(#1)`` or ``(1) 2
+    (#3)`` and digit patterns like ``(#1\d{2})`` or ``(#[13579])``,
+    CodePattern matches the integer array directly with the same
+    results as the regular expression on the string: the same
+    non-overlapping leftmost matches, including the ones that start
+    inside a code and are discarded.
+
+    Patterns that match across codes, e.g., repetition, alternation,
+    ``^`` or ``$`` anchors, or whitespace inside a code pattern, are
+    not vectorized, ``is_vectorized`` is False and the regular
+    expression is the fallback.
+
+    Parameters
+    ----------
+    pattern : str
+       code map regexp with one anchor capture group (#...)
+
+    Attributes
+    ----------
+    is_vectorized : bool
+       True if find() can match this pattern
+    groups : list of tuple
+       (start, stop, is_anchor) for each capture group in regexp
+       group number order, start and stop are offsets of the group's
+       codes from the start of the match
+    n_codes : int
+       number of codes in a match
+
+    """
+
+    # one code pattern: optional minus then digits, \d, or classes of
+    # digits, each optionally repeated, see _parse()
+    _code_patt = re.compile(r"-?(?:(?:\d|\\d|\[[0-9-]+\])(?:[?*+]|\{\d+(?:,\d*)?\})?)+")
+    _item_patt = re.compile(r"\((#|\?:)?([^()\s]+(?: [^()\s]+)*)\)|([^()\s]+)")
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.is_vectorized = False
+        self.groups = []
+        self.n_codes = 0
+        try:
+            self._parse(pattern)
+        except ValueError:
+            self.groups = []
+            self.n_codes = 0
+        else:
+            self.is_vectorized = True
+
+    def _parse(self, pattern):
+        """split pattern into code patterns and capture groups, or raise ValueError"""
+        if not isinstance(pattern, str):
+            raise ValueError(pattern)
+
+        # (code pattern, followed by a code boundary) for each code in a match
+        codes = []
+        pos = 0
+        while True:
+            item = self._item_patt.match(pattern, pos)
+            if item is None:
+                raise ValueError(pattern)
+            if item.group(2) is not None:
+                # a (...), (#...), or (?:...) group, the regexp has \b at the )
+                group_codes = item.group(2).split(" ")
+                if item.group(1) != "?:":
+                    is_anchor = item.group(1) == "#"
+                    start = len(codes)
+                    self.groups.append((start, start + len(group_codes), is_anchor))
+                codes += [(code, True) for code in group_codes]
+            else:
+                codes.append((item.group(3), False))
+            pos = item.end()
+            if pos == len(pattern):
+                break
+            if pattern[pos] != " ":
+                raise ValueError(pattern)
+            pos += 1
+
+        anchors = [g for g in self.groups if g[2]]
+        if len(anchors) != 1 or anchors[0][1] - anchors[0][0] != 1:
+            raise ValueError(pattern)
+
+        # a code followed by a space or \b must match a whole code, a
+        # trailing code outside a group only the start of one.
+        self._patts = []
+        for i, (code, is_bounded) in enumerate(codes):
+            if self._code_patt.fullmatch(code) is None:
+                raise ValueError(pattern)
+            patt = re.compile(code)
+            if patt.fullmatch("") or patt.fullmatch("-"):
+                raise ValueError(pattern)
+            self._patts.append(patt)
+        self._last_is_prefix = not codes[-1][1]
+        self.n_codes = len(codes)
+
+    def find(self, evcodes):
+        """find the matches in an array of event codes
+
+        Parameters
+        ----------
+        evcodes : 1-D array-like of int or EventCodes
+           pass EventCodes to share the work across the patterns
+           of a code map
+
+        Returns
+        -------
+        match_ids : numpy.ndarray
+           rank of the match among the regexp matches, those that
+           start inside a code included, as in events.find_evcodes()
+        starts : numpy.ndarray
+           evcodes index of the first code in the match
+
+        """
+        if not self.is_vectorized:
+            raise ValueError(f"{self.pattern} is not vectorized, use the regexp")
+
+        if not isinstance(evcodes, EventCodes):
+            evcodes = EventCodes(evcodes)
+
+        n_starts = len(evcodes.evcodes) - self.n_codes + 1
+        if n_starts < 1:
+            return np.array([], dtype=int), np.array([], dtype=int)
+
+        # only the codes the first pattern matches, from the start or
+        # from inside, can start a match
+        code_idxs = evcodes.code_idxs
+        first_patt = self._patts[0]
+        is_first = evcodes.test(first_patt, "fullmatch")
+        first_offsets = evcodes.test(first_patt, "offsets")
+        has_offsets = np.zeros(len(is_first), dtype=bool)
+        has_offsets[list(first_offsets)] = True
+        starts = [evcodes.positions[u] for u in np.flatnonzero(is_first | has_offsets)]
+        starts = np.sort(np.concatenate([np.array([], dtype=int)] + starts))
+        starts = starts[starts < n_starts]
+
+        # codes after the first match at each start
+        is_rest = np.ones(len(starts), dtype=bool)
+        for i, patt in enumerate(self._patts[1:], 1):
+            is_prefix = self._last_is_prefix and i == self.n_codes - 1
+            is_match = evcodes.test(patt, "match" if is_prefix else "fullmatch")
+            is_rest &= is_match[code_idxs[starts + i]]
+
+        is_valid = is_first[code_idxs[starts]] & is_rest
+        is_inside = ~is_valid & is_rest & has_offsets[code_idxs[starts]]
+        candidates = starts[is_valid | is_inside]
+        is_valid = is_valid[is_valid | is_inside]
+
+        # non-overlapping, leftmost first as re.finditer()
+        if not self._last_is_prefix and np.all(np.diff(candidates) >= self.n_codes):
+            accepted = candidates
+            is_accepted_valid = is_valid
+        else:
+            code_strs = evcodes.code_strs
+            if self._last_is_prefix:
+                end_offsets = evcodes.test(self._patts[-1], "ends")
+            accepted, is_accepted_valid = [], []
+            end_code, end_offset = -1, 0
+            for k, k_is_valid in zip(candidates.tolist(), is_valid.tolist()):
+                if k < end_code:
+                    continue
+                if k == end_code:
+                    # only a match from inside the code, after the last one
+                    offsets = first_offsets.get(code_idxs[k], [])
+                    if not any(p >= end_offset for p in offsets):
+                        continue
+                    is_accepted_valid.append(False)
+                else:
+                    is_accepted_valid.append(k_is_valid)
+                accepted.append(k)
+                end_code = k + self.n_codes - 1
+                if self._last_is_prefix:
+                    end_offset = end_offsets[code_idxs[end_code]]
+                else:
+                    end_offset = len(code_strs[code_idxs[end_code]])
+            accepted = np.array(accepted, dtype=int)
+            is_accepted_valid = np.array(is_accepted_valid, dtype=bool)
+
+        match_ids = np.flatnonzero(is_accepted_valid)
+        return match_ids, accepted[is_accepted_valid]
+
+
+class EventCodes:
+    """1-D array of event codes indexed by distinct code for CodePattern.find()
+
+    Index the event codes of a dblock once to find the matches for
+    all the patterns in a code map. The code pattern tests are
+    evaluated once per distinct code and shared by the patterns, and
+    a pattern only looks at the positions of the codes that can start
+    a match.
+
+    Parameters
+    ----------
+    evcodes : 1-D array-like of int
+
+    Attributes
+    ----------
+    evcodes : numpy.ndarray
+    code_strs : list of str
+       the distinct codes as strings, sorted by code
+    code_idxs : numpy.ndarray
+       index of each event code in code_strs
+    positions : list of numpy.ndarray
+       event code indexes of each distinct code
+
+    """
+
+    _literal_patt = re.compile(r"-?\d+")
+
+    def __init__(self, evcodes):
+        self.evcodes = np.asarray(evcodes)
+        code_vals, code_idxs = np.unique(self.evcodes, return_inverse=True)
+        self.code_strs = [str(v) for v in code_vals]
+        self.code_idxs = code_idxs.ravel()
+
+        order = np.argsort(self.code_idxs, kind="stable")
+        counts = np.bincount(self.code_idxs, minlength=len(code_vals))
+        self.positions = np.split(order, np.cumsum(counts)[:-1])
+
+        self._tests = dict()
+        self._affixes = None
+        self._code_str = None
+        self._delims = None
+
+    def test(self, patt, how):
+        """per distinct code results of a compiled code pattern, memoized
+
+        Parameters
+        ----------
+        patt : re.Pattern
+        how : str
+           "match" or "fullmatch" boolean array, "ends" array of the
+           end of the match at the start of the code, else "offsets"
+           dict of the offsets inside the code that the pattern
+           fullmatches from, for the codes that have any
+
+        """
+        key = (patt.pattern, how)
+        if key not in self._tests:
+            if self._literal_patt.fullmatch(patt.pattern):
+                result = self._test_literal(patt.pattern, how)
+            else:
+                result = self._test_regexp(patt, how)
+            self._tests[key] = result
+        return self._tests[key]
+
+    def _test_regexp(self, patt, how):
+        """test the pattern on each distinct code"""
+        if how == "offsets":
+            offsets = (
+                [p for p in range(1, len(s)) if patt.fullmatch(s[p:])]
+                for s in self.code_strs
+            )
+            return {u: offs for u, offs in enumerate(offsets) if offs}
+        if how == "ends":
+            matches = (patt.match(s) for s in self.code_strs)
+            return np.array([m.end() if m else 0 for m in matches], dtype=int)
+        matches = (getattr(patt, how)(s) for s in self.code_strs)
+        return np.array([m is not None for m in matches], dtype=bool)
+
+    def _test_literal(self, literal, how):
+        """look up the codes that match a literal code like 12 or -3"""
+        if self._affixes is None:
+            # distinct codes by prefix and by (suffix, offset)
+            self._affixes = (dict(), dict())
+            for u, s in enumerate(self.code_strs):
+                for p in range(1, len(s) + 1):
+                    self._affixes[0].setdefault(s[:p], []).append(u)
+                for p in range(1, len(s)):
+                    self._affixes[1].setdefault(s[p:], []).append((u, p))
+        prefixes, suffixes = self._affixes
+
+        if how == "offsets":
+            offsets = dict()
+            for u, p in suffixes.get(literal, []):
+                offsets.setdefault(u, []).append(p)
+            return offsets
+
+        codes = prefixes.get(literal, [])
+        if how == "fullmatch":
+            codes = [u for u in codes if self.code_strs[u] == literal]
+        result = np.zeros(len(self.code_strs), dtype=int if how == "ends" else bool)
+        result[codes] = len(literal) if how == "ends" else True
+        return result
+
+    @property
+    def code_str(self):
+        """the event codes as a string, each code preceded by a single space"""
+        if self._code_str is None:
+            self._code_str = "".join(" {0}".format(e) for e in self.evcodes)
+        return self._code_str
+
+    @property
+    def delims(self):
+        """string offset of each event code in code_str"""
+        if self._delims is None:
+            lens = np.array([len(s) for s in self.code_strs], dtype=int)
+            lens = lens[self.code_idxs]
+            self._delims = np.cumsum(lens + 1) - lens
+        return self._delims
@@ -1,11 +1,14 @@
 """:meta private:"""
 
+import os
 import re
+import multiprocessing
 import yaml
 import h5py
 import numpy as np
 import pandas as pd
 from . import h5tools, mkh5
+from .codetagger import CodePattern, EventCodes
 
 
 def read_excel_codemap(file, sheet_name=0):
@@ -103,26 +106,101 @@ def find_evcodes(pattern, ticks, evcodes):
     """
 
     _validate_ticks_and_evcodes(ticks, evcodes)
+    matches = _find_evcodes(_compile_pattern(pattern), ticks, EventCodes(evcodes))
+    if matches is None:
+        return pd.DataFrame([])
+    return pd.DataFrame(matches)
+
+
+def _compile_pattern(pattern):
+    """Validate pattern, compile for the integer codes or else as a regexp."""
+
     _validate_pattern(pattern)
 
+    # literal and digit code patterns are matched on the integer codes,
+    # the rest with the regular expression on the stringified codes
+    code_pattern = CodePattern(pattern)
+    if code_pattern.is_vectorized:
+        return code_pattern
+
     # the hash denotes the anchor group, we make it named
     pattern = pattern.replace("(#", "(?P<anchor>")
 
     # group match should align with an alphanumeric word boundary on the right
     pattern = pattern.replace(r")", r"\b)")
 
-    compiled_pattern = re.compile(pattern)
+    return re.compile(pattern)
+
+
+def _find_evcodes(compiled_pattern, ticks, event_codes):
+    """Match a compiled pattern, return find_evcodes() columns or None.
+
+    The matchers return the group_id, match_id, and evcodes index of each
+    matched group, and the group_id of the anchor.
+    """
+
+    if isinstance(compiled_pattern, CodePattern):
+        matches = _find_code_pattern(compiled_pattern, event_codes)
+    else:
+        matches = _find_regexp(compiled_pattern, event_codes)
+    if matches is None:
+        return None
+    group_id, match_id, indices, anchor_group_id = matches
+
+    # derive anchor information, match ids are sorted and each match has one anchor
+    is_anchor = group_id == anchor_group_id
+    anchor_indices = indices[is_anchor][np.searchsorted(match_id[is_anchor], match_id)]
+
+    evcodes = event_codes.evcodes
+    dblock_ticks = ticks[indices]
+    anchor_tick = ticks[anchor_indices]
+    return {
+        "group_id": group_id,
+        "match_id": match_id,
+        "dblock_ticks": dblock_ticks,
+        "match_code": evcodes[indices],
+        "is_anchor": is_anchor,
+        "anchor_tick": anchor_tick,
+        "anchor_code": evcodes[anchor_indices],
+        "anchor_tick_delta": dblock_ticks - anchor_tick,
+    }
+
+
+def _find_code_pattern(code_pattern, event_codes):
+    """Match a vectorized CodePattern, see _find_evcodes()."""
+
+    match_ids, starts = code_pattern.find(event_codes)
+    if len(starts) == 0:
+        return None
+
+    # check that no group matched more than one code
+    if any(stop - start != 1 for start, stop, _ in code_pattern.groups):
+        raise ValueError("Groups must match one code.")
+
+    # one row per capture group per match, as the regexp groups
+    group_offsets = np.array([start for start, _, _ in code_pattern.groups])
+    anchor_group_id = [g[2] for g in code_pattern.groups].index(True) + 1
+    group_id = np.tile(np.arange(1, len(group_offsets) + 1), len(starts))
+    match_id = np.repeat(match_ids, len(group_offsets))
+    indices = (starts[:, np.newaxis] + group_offsets).ravel()
+    return group_id, match_id, indices, anchor_group_id
+
+
+def _find_regexp(compiled_pattern, event_codes):
+    """Match the regexp on the codes string, see _find_evcodes()."""
+
+    evcodes = event_codes.evcodes
 
     # this is necessary to identify anchor groups later
     anchor_group_id = compiled_pattern.groupindex["anchor"]
 
-    # convert evcodes to string so we can run regex
-    sep = " "
-    codestring = sep + sep.join(evcodes.astype(str))
+    # evcodes as a string so we can run regex
+    codestring = event_codes.code_str
 
     # map positions in code string to indices in evcodes
-    sep_matches = re.finditer(sep, codestring)
-    position_to_index = {match.end(): i for i, match in enumerate(sep_matches)}
+    position_to_index = {
+        position: i for i, position in enumerate(event_codes.delims.tolist())
+    }
     assert len(position_to_index) == len(evcodes)
 
     # run regular expression search on the codestring
@@ -150,27 +228,20 @@ def find_evcodes(pattern, ticks, evcodes):
     # further manipulations are better done in pandas
     df = pd.DataFrame(matches_info)
     if df.empty:
-        return df
+        return None
 
     # we need to recover indices from code positions in the code string
-    indices = df["group_position"].map(position_to_index)
-    df["dblock_ticks"] = ticks[indices]
-    df["match_code"] = evcodes[indices]
-    df["is_anchor"] = df["group_id"] == anchor_group_id
+    indices = df["group_position"].map(position_to_index).to_numpy()
 
     # verify that matched codes are equal to corresponding evcodes
-    assert (df["group"].astype(int) == df["match_code"]).all()
-    df.drop(["group", "group_position"], axis=1, inplace=True)
+    assert (df["group"].astype(int) == evcodes[indices]).all()
 
-    # derive anchor information
-    anchors = df[df["is_anchor"]]
-    anchor_data = anchors[["match_id", "dblock_ticks", "match_code"]].rename(
-        columns={"dblock_ticks": "anchor_tick", "match_code": "anchor_code"}
+    return (
+        df["group_id"].to_numpy(),
+        df["match_id"].to_numpy(),
+        indices,
+        anchor_group_id,
     )
-    df = df.merge(anchor_data, on="match_id")
-    df["anchor_tick_delta"] = df["dblock_ticks"] - df["anchor_tick"]
-
-    return df
 
 
 def _validate_pattern(pattern):
@@ -207,7 +278,7 @@ def _validate_ticks_and_evcodes(ticks, evcodes):
         )
 
 
-def build_event_table(h5_fname, code_map, header_map_f):
+def build_event_table(h5_fname, code_map, header_map_f, n_jobs=1):
     """Construct an event table from the provided codemap and header map file.
 
     Parameters
@@ -219,12 +290,22 @@ def build_event_table(h5_fname, code_map, header_map_f):
         column specifies regular expressions describing event code patterns.
     header_map_f : str
         header map file name, to be replaced by DataFrame
+    n_jobs : int
+        number of worker processes to match the codemap in runs of
+        dblocks in parallel, -1 uses all CPUs. The event table is
+        the same regardless.
 
     Returns
     -------
     event_table : pandas DataFrame
     """
 
+    is_n_jobs = isinstance(n_jobs, (int, np.integer))
+    if not (is_n_jobs and (n_jobs >= 1 or n_jobs == -1)):
+        raise ValueError(f"n_jobs must be a positive integer or -1 not {n_jobs}")
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+
     with h5py.File(h5_fname, "r") as h5:
 
         # dblock census
@@ -242,7 +323,13 @@ def build_event_table(h5_fname, code_map, header_map_f):
 
         # build three dataframes
         header_df = build_header_df(dblocks_and_paths, header_map_f)
-        match_df = build_match_df(nonzero, code_map)
+        if n_jobs == 1 or len(dblocks_and_paths) < 2:
+            match_df = build_match_df(nonzero, code_map)
+        else:
+            dblock_paths = [dblock_path for _, dblock_path in dblocks_and_paths]
+            match_df = _build_match_df_parallel(
+                h5_fname, dblock_paths, code_map, n_jobs
+            )
         dblock_df = build_dblock_df(nonzero)
 
         # merge them to get the event table
@@ -266,21 +353,87 @@ def build_event_table(h5_fname, code_map, header_map_f):
 
 
 def build_match_df(dblocks_and_paths, code_map):
-    """Run pattern matcher on dblocks using codemap."""
+    """Run pattern matcher on dblocks using codemap.
 
-    match_dfs = (
-        (
-            find_evcodes(row.regexp, db["dblock_ticks"], db["log_evcodes"]).assign(
-                Index=row.Index, dblock_path=dbp
-            )
-        )
+    The codemap patterns are compiled once and each dblock's event
+    codes are indexed once and matched with all the patterns, see
+    EventCodes.
+    """
+
+    compiled_patterns = [_compile_pattern(regexp) for regexp in code_map["regexp"]]
+    dblock_dfs = [
+        _build_dblock_match_df(db, dbp, code_map, compiled_patterns)
         for db, dbp in dblocks_and_paths
-        for row in code_map.itertuples()
+    ]
+    return _concat_match_dfs(dblock_dfs, code_map)
+
+
+def _build_match_df_parallel(h5_fname, dblock_paths, code_map, n_jobs):
+    """build_match_df() in worker processes, each matches a run of dblocks."""
+
+    # fail on bad patterns here, not in the workers
+    for regexp in code_map["regexp"]:
+        _compile_pattern(regexp)
+
+    n_tasks = min(4 * n_jobs, len(dblock_paths))
+    tasks = [
+        (h5_fname, [dblock_paths[i] for i in run], code_map)
+        for run in np.array_split(np.arange(len(dblock_paths)), n_tasks)
+    ]
+    with multiprocessing.Pool(min(n_jobs, n_tasks)) as pool:
+        dblock_dfs = [
+            dblock_df
+            for dblock_dfs in pool.imap(_build_match_df_worker, tasks)
+            for dblock_df in dblock_dfs
+        ]
+    return _concat_match_dfs(dblock_dfs, code_map)
+
+
+def _build_match_df_worker(task):
+    """Match the codemap in some dblocks in a worker process."""
+
+    h5_fname, dblock_paths, code_map = task
+    compiled_patterns = [_compile_pattern(regexp) for regexp in code_map["regexp"]]
+    with h5py.File(h5_fname, "r") as h5:
+        return [
+            _build_dblock_match_df(
+                h5[dbp][h5[dbp]["log_evcodes"] != 0], dbp, code_map, compiled_patterns
+            )
+            for dbp in dblock_paths
+        ]
+
+
+def _build_dblock_match_df(db, dbp, code_map, compiled_patterns):
+    """Match the compiled codemap patterns in one dblock, None if nothing matches."""
+
+    ticks, evcodes = db["dblock_ticks"], db["log_evcodes"]
+    _validate_ticks_and_evcodes(ticks, evcodes)
+    event_codes = EventCodes(evcodes)
+
+    # the codemap rows with matches in this dblock, in codemap order
+    row_matches = []
+    for row_idx, compiled_pattern in enumerate(compiled_patterns):
+        matches = _find_evcodes(compiled_pattern, ticks, event_codes)
+        if matches is not None:
+            row_matches.append((row_idx, matches))
+    if not row_matches:
+        return None
+
+    columns = {
+        col: np.concatenate([matches[col] for _, matches in row_matches])
+        for col in row_matches[0][1]
+    }
+    columns["Index"] = np.repeat(
+        code_map.index.to_numpy()[[row_idx for row_idx, _ in row_matches]],
+        [len(matches["group_id"]) for _, matches in row_matches],
     )
+    return pd.DataFrame(columns).assign(dblock_path=dbp)
+
 
-    nonempty_match_dfs = [match_df for match_df in match_dfs if not match_df.empty]
+def _concat_match_dfs(dblock_dfs, code_map):
+    """Stack the dblock match DataFrames in order and join the codemap."""
 
-    match_df = pd.concat(nonempty_match_dfs, ignore_index=True)
+    match_df = pd.concat([df for df in dblock_dfs if df is not None], ignore_index=True)
     match_df = match_df.join(code_map, on="Index")
 
     return match_df
@@ -293,16 +446,23 @@ def build_header_df(dblocks_and_paths, header_map_f):
     hio.set_slicer(header_map_f)
 
     header_data = []
+    headers = []
     for dblock, dblock_path in dblocks_and_paths:
         hio.get(dblock)
+        headers.append(hio.header)
         data = {
-            **dict(hio.get_slices()),
             "dblock_path": dblock_path,
             "data_group": dblock.parent.name.lstrip("/"),
             "dblock_srate": hio.header["samplerate"],
         }
         header_data.append(data)
 
+    # slice the headers in one pass, slices go first as before
+    header_data = [
+        {**dict(slices), **data}
+        for slices, data in zip(hio.slice_headers(headers), header_data)
+    ]
+
     return pd.DataFrame(header_data)
 
 
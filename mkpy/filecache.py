@@ -0,0 +1,110 @@
+""":meta private:
+
+Fingerprint-keyed cache of parsed code map and YAML header files.
+
+The same few codemaps and .yhdr files are typically parsed over and
+over in batch conversion and event tagging. Parsed results are kept
+in memory keyed by the file contents so an edited file is parsed
+again. Set DISK_CACHE_DIR to a directory, e.g., mkpy.base_dir /
+"cache", to also keep them on disk across Python sessions.
+"""
+
+import copy
+import hashlib
+import pickle
+import warnings
+from collections import OrderedDict
+from pathlib import Path
+
+import yaml
+
+from mkpy import __version__
+
+# libyaml's C parser if PyYAML was built with it
+YAML_SAFE_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# directory for the on-disk cache, default None is memory only
+DISK_CACHE_DIR = None
+
+# number of parsed files kept in memory
+MEMORY_CACHE_SIZE = 64
+
+_MEMORY_CACHE = OrderedDict()
+
+
+def fingerprint(kind, data, *args):
+    """return a cache key for data parsed by kind of loader
+
+    Parameters
+    ----------
+    kind : str
+       name of the loader, e.g., "codemap"
+    data : bytes or str
+       the file contents
+    *args : str
+       anything else the parsed result depends on, e.g., sheet name
+
+    Returns
+    -------
+    key : str
+       sha256 hex digest of the mkpy version, kind, data, and args
+    """
+    if isinstance(data, str):
+        data = data.encode("utf8")
+    key = hashlib.sha256()
+    for arg in [__version__, kind, *args]:
+        key.update(str(arg).encode("utf8") + b"\0")
+    key.update(data)
+    return key.hexdigest()
+
+
+def get(key, load):
+    """return a copy of the cached result for key, calling load() on a miss
+
+    Parameters
+    ----------
+    key : str
+       from fingerprint()
+    load : callable
+       no argument function that parses the file, exceptions propagate
+       and nothing is cached
+
+    Returns
+    -------
+    result : object
+       a deep copy, callers are free to modify it
+    """
+    if key in _MEMORY_CACHE:
+        _MEMORY_CACHE.move_to_end(key)
+        return copy.deepcopy(_MEMORY_CACHE[key])
+
+    result = None
+    disk_f = None
+    if DISK_CACHE_DIR is not None:
+        disk_f = Path(DISK_CACHE_DIR) / f"{key}.pkl"
+        if disk_f.exists():
+            try:
+                with open(disk_f, "rb") as f:
+                    result = pickle.load(f)
+            except Exception as fail:
+                warnings.warn(f"ignoring unreadable file cache {disk_f}: {fail}")
+
+    if result is None:
+        result = load()
+        if disk_f is not None:
+            try:
+                disk_f.parent.mkdir(parents=True, exist_ok=True)
+                with open(disk_f, "wb") as f:
+                    pickle.dump(result, f)
+            except OSError as fail:
+                warnings.warn(f"file cache {disk_f} not written: {fail}")
+
+    _MEMORY_CACHE[key] = result
+    while len(_MEMORY_CACHE) > MEMORY_CACHE_SIZE:
+        _MEMORY_CACHE.popitem(last=False)
+    return copy.deepcopy(result)
+
+
+def clear():
+    """empty the in-memory cache, files in DISK_CACHE_DIR are left alone"""
+    _MEMORY_CACHE.clear()
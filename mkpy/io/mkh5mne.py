@@ -1957,7 +1957,7 @@ def get_epochs_metadata(mne_raw, epochs_name):
     return pd.DataFrame(metadata).sort_values("mne_raw_tick")
 
 
-def get_epochs(mne_raw, epochs_name, metadata_columns="all", **kwargs):
+def get_epochs(mne_raw, epochs_name, metadata_columns="all", decimate=None, **kwargs):
     """retrieve mkh5 epochs table dataframe from mne.Raw.info["description"]
 
     The mne.Epoch interval [tmin, tmax] matches the tmin_ms, tmax_ms
@@ -1976,6 +1976,13 @@ def get_epochs(mne_raw, epochs_name, metadata_columns="all", **kwargs):
        Specify which metadata columns to include with the epochs,
        default is all.
 
+    decimate : int, optional
+       Low-pass filter the data channels of a copy of `mne_raw` at
+       sfreq / (3 * decimate) and decimate the epochs by this
+       factor with mne.Epochs(..., decim=decimate). MNE does not
+       filter for `decim` so use this instead. The raw is filtered
+       piecewise between the mkh5 dblock boundaries.
+
     **kwargs
        kwargs passed to mne.Epochs()
 
@@ -1995,9 +2002,22 @@ def get_epochs(mne_raw, epochs_name, metadata_columns="all", **kwargs):
         for col in metadata_columns:
             if not (isinstance(col, str) and col in metadata.columns):
                 error_msg = f"{col} is not a metadata data column"
+    if decimate is not None:
+        if not (isinstance(decimate, (int, np.integer)) and decimate >= 1):
+            error_msg = f"decimate must be a positive integer not {decimate}"
+        if "decim" in kwargs:
+            error_msg = "set decimate or mne.Epochs decim, not both"
     if error_msg:
         raise ValueError(error_msg)
 
+    # anti-alias filter a copy, MNE skips the dblock EDGE boundaries
+    if decimate is not None and decimate > 1:
+        mne_raw = mne_raw.copy().load_data()
+        mne_raw.filter(
+            l_freq=None, h_freq=mne_raw.info["sfreq"] / (3 * decimate), picks="data"
+        )
+        kwargs["decim"] = decimate
+
     # epoch interval start, stop in seconds, relative to
     # timelocking event at mne_raw_tick
     tmins = metadata["diti_hop"] / mne_raw.info["sfreq"]
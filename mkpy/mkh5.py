@@ -1,6 +1,8 @@
 import hashlib
 import inspect
+import multiprocessing
 import os.path
+import platform
 import re
 import warnings
 import h5py
@@ -10,7 +12,10 @@ import yaml
 import uuid
 import pandas as pd
 import copy
+import functools
 import logging
+import types
+from collections import OrderedDict
 from pathlib import Path
 
 # import dpath.util
@@ -18,8 +23,8 @@ from pathlib import Path
 from mkpy import dpath
 import numpy as np
 import matplotlib.pyplot as plt
-from mkpy import mkio, pygarv, h5tools
-from mkpy.codetagger import CodeTagger
+from mkpy import mkio, pygarv, h5tools, filecache
+from mkpy.codetagger import CodeTagger, EventCodes
 from . import current_function, indent, log_exceptions
 
 from mkpy import get_ver
@@ -91,6 +96,22 @@ class mkh5:
     # HDF5 slashpath to where epochs tables are stashed in the mkh5 file
     EPOCH_TABLES_PATH = "_epoch_tables"
 
+    # HDF5 slashpath to where virtual epochs datasets are stashed in the mkh5 file
+    EPOCH_VIRTUAL_PATH = "_epoch_virtual"
+
+    # HDF5 slashpath to where compact epochs table column levels are stashed
+    EPOCH_LEVELS_PATH = "_epoch_levels"
+
+    # HDF5 slashpath to where cached results are stashed in the mkh5 file
+    CACHE_PATH = "_mkh5_cache"
+
+    # get_epoch() in-process dblock chunk cache, samples per chunk and size limit
+    CHUNK_CACHE_SAMPLES = 4096
+    CHUNK_CACHE_BYTES = 256 * 2**20
+
+    # _get_head() in-process header index size limit, header leaves
+    HEADER_INDEX_LEAVES = 2**20
+
     class Mkh5Error(Exception):
         """general purposes mkh5 error"""
 
@@ -242,6 +263,7 @@ class mkh5:
             self._json_key = "json_header"  # key used to access h5py.Dataset.attrs[]
             self._header = None
             self._slicer = None
+            self._slicer_getters = None  # see _compile_slicer()
 
         # ------------------------------------------------------------
         # PUBLIC CRUD
@@ -502,28 +524,105 @@ class mkh5:
                 )
                 raise RuntimeError(msg)
 
-            slices = list()
-            hdr_paths = [
-                p for p in dpath.path.paths(self._header, dirs=False, leaves=False)
-            ]
-            for k, v in self._slicer.items():
-                this_slice = None
-                try:
-                    datum = dpath.util.get(self._header, v)
-                    this_slice = (k, datum)
-                except Exception as fail:
-                    if isinstance(fail, KeyError):
-                        this_slice = (k, float("NaN"))  # key not found
-                    elif isinstance(
-                        fail, ValueError
-                    ):  # multiple values ... shouldn't happen
-                        msg = "mutiple leaves match dpath glob ... but how?"
-                        raise ValueError(msg)
-                    else:
-                        print("some horrible error in HeaderIO.get_slices()")
-                        raise fail
-                slices.append(this_slice)
-            return slices  # possibly empty
+            return self.slice_headers([self._header])[0]  # possibly empty
+
+        def slice_headers(self, headers):
+            """slice out the header map data values from many dblock headers at once
+
+            Parameters
+            ----------
+            headers : list of dict
+               dblock headers, e.g., HeaderIO.header for each dblock
+
+            Returns
+            -------
+            slices : list of lists of 2-ples
+               one list for each header, same as get_slices()
+
+
+            The header map is compiled once into key path lookups,
+            only the paths with glob patterns are searched with
+            dpath.util.get().
+
+            """
+            if self._slicer is None or not isinstance(self._slicer, dict):
+                msg = (
+                    "set self._slicer = HeaderIO._load_yaml_docs(yaml_f) "
+                    "before slicing"
+                )
+                raise RuntimeError(msg)
+
+            # (re)compile if the slicer is new
+            if self._slicer_getters is None or (
+                self._slicer_getters[0] is not self._slicer
+            ):
+                getters = self._compile_slicer(self._slicer)
+                self._slicer_getters = (self._slicer, getters)
+
+            slices = [list() for header in headers]
+            for k, v, is_glob in self._slicer_getters[1]:
+                for header, header_slices in zip(headers, slices):
+                    try:
+                        if is_glob:
+                            datum = dpath.util.get(header, v)
+                        else:
+                            datum = self._get_key_path(header, v)
+                        this_slice = (k, datum)
+                    except Exception as fail:
+                        if isinstance(fail, KeyError):
+                            this_slice = (k, float("NaN"))  # key not found
+                        elif isinstance(
+                            fail, ValueError
+                        ):  # multiple values ... shouldn't happen
+                            msg = "mutiple leaves match dpath glob ... but how?"
+                            raise ValueError(msg)
+                        else:
+                            print("some horrible error in HeaderIO.slice_headers()")
+                            raise fail
+                    header_slices.append(this_slice)
+            return slices
+
+        def _compile_slicer(self, slicer):
+            """return the slicer as a list of (col_name, path, is_glob)
+
+            Glob-free paths are converted to lists of str keys for
+            _get_key_path(), glob paths are left for dpath.util.get().
+            """
+            compiled = []
+            for k, v in slicer.items():
+                is_glob = len(v) == 0 or any(dpath.path.is_glob(str(p)) for p in v)
+                compiled.append((k, v if is_glob else [str(p) for p in v], is_glob))
+            return compiled
+
+        def _get_key_path(self, header, path):
+            """fetch the header value at a glob-free path like dpath.util.get()
+
+            Parameters
+            ----------
+            header : dict
+            path : list of str
+               dict keys and list indices, as str
+
+            Raises
+            ------
+            KeyError if the path is not in the header
+            """
+            datum = header
+            for key in path:
+                if isinstance(datum, dict):
+                    # dpath skips keys beginning with +
+                    if key.startswith("+") or key not in datum:
+                        raise KeyError(path)
+                    datum = datum[key]
+                elif isinstance(datum, list):
+                    if not (key.isdigit() and str(int(key)) == key):
+                        raise KeyError(path)
+                    if int(key) >= len(datum):
+                        raise KeyError(path)
+                    datum = datum[int(key)]
+                else:
+                    raise KeyError(path)
+            return datum
 
         # ------------------------------------------------------------
         # PRIVATE-ish CRUD
@@ -604,6 +703,11 @@ class mkh5:
                     raise TypeError(msg)
 
                 # FIX ME: protect reserved keys??
+                keys, is_glob = _parse_slashpath(sv[0])
+                if not is_glob and self._set_key_path(keys, sv[1]):
+                    continue
+
+                # globs and paths into lists go the long way
                 old_val = dpath.util.search(self._header, sv[0])
                 if len(old_val) == 0 and isinstance(old_val, dict):
                     # print('new key:value ', sv[0], sv[1])
@@ -615,6 +719,46 @@ class mkh5:
                         raise RuntimeError("failed to set " + sv[0] + " = " + sv[1])
             self._check_header()
 
+        def _set_key_path(self, keys, value):
+            """set the header value at a glob-free path of dict keys like dpath
+
+            Missing dicts along the path are created as dpath.util.new()
+            does and existing values are overwritten as dpath.util.set()
+            does.
+
+            Parameters
+            ----------
+            keys : tuple of str
+               from _parse_slashpath()
+            value : object
+               JSON-ifiable
+
+            Returns
+            -------
+            is_set : bool
+               False, with the header unchanged, if a key is all
+               digits, which dpath may take for a list index, or the
+               path runs into a list, a leaf, or a dict with non-str keys
+            """
+            if any(key.isdigit() for key in keys):
+                return False
+
+            datum = self._header
+            for key in keys[:-1]:
+                if not isinstance(datum, dict):
+                    return False
+                if key not in datum:
+                    if not all(isinstance(k, str) for k in datum):
+                        return False
+                    datum[key] = dict()
+                datum = datum[key]
+            if not isinstance(datum, dict):
+                return False
+            if keys[-1] not in datum and not all(isinstance(k, str) for k in datum):
+                return False
+            datum[keys[-1]] = value
+            return True
+
         def _load_yaml_docs(self, yml_f):
             """generic multi-doc YAML loader for header data and extractor files"""
 
@@ -622,9 +766,19 @@ class mkh5:
             # check for legal yaml
             with open(yml_f, "r") as f:
                 yml_str = f.read()
-                hdocs = yaml.load_all(yml_str, Loader=yaml.SafeLoader)
                 yml_f_md5 = hashlib.md5(yml_str.encode("utf8")).hexdigest()
 
+            # parse each version of a YAML file once, see mkpy.filecache
+            cache_key = filecache.fingerprint("yaml_docs", yml_str)
+            yml, doc_names = filecache.get(
+                cache_key, lambda: self._parse_yaml_docs(yml_str, yml_f)
+            )
+            return (yml, doc_names, yml_f_md5)
+
+        def _parse_yaml_docs(self, yml_str, yml_f):
+            """parse and check the YAML documents for _load_yaml_docs()"""
+            hdocs = yaml.load_all(yml_str, Loader=filecache.YAML_SAFE_LOADER)
+
             # load up the docs w/ modicum of error checking
             yml = dict()
             doc_names = []  #
@@ -657,7 +811,7 @@ class mkh5:
                         doc_names.append(hdoc["name"])
                         yml[hdoc["name"]] = hdoc
 
-            return (yml, doc_names, yml_f_md5)
+            return (yml, doc_names)
 
         def _load_yhdr(self, yhdr_f):
             """load a YAML format header extension
@@ -994,10 +1148,13 @@ class mkh5:
             with h5py.File(self.h5_fname, "r+") as h5:
                 h5[dbp]["pygarv"] = pygarv._garv_dblock(hdr, dblock)
 
+        # the pygarv stream changed but the dblock headers did not
+        self.clear_cache("epochs")
+
     # ------------------------------------------------------------
     # Public event code tag mapping and epoching utilities
     # ------------------------------------------------------------
-    def get_event_table(self, code_map_f, header_map_f=None):
+    def get_event_table(self, code_map_f, header_map_f=None, n_jobs=1, cache=False):
         """Reads the code tag and header extractor and returns an event lookup table
 
         Parameters
@@ -1010,6 +1167,16 @@ class mkh5:
             YAML header extractor file, keys match header keys, values specify
             name of the event table column to put the header data
 
+        n_jobs : int {1}
+            Number of worker processes to sweep the code map across
+            runs of dblocks in parallel, -1 uses all CPUs. The event
+            table is the same regardless.
+
+        cache : bool {False}
+            If True look up each dblock's events in the mkh5 file
+            cache and sweep the code map across only the dblocks that
+            are not cached yet, see Note.
+
         Returns
         -------
         event_table : pandas.DataFrame
@@ -1044,6 +1211,16 @@ class mkh5:
            a ``ccode``, column the `log_ccode` column is ignored for
            pattern matching.
 
+        3. With ``cache=True`` the events found in each dblock are
+           stored in the mkh5 file under CACHE_PATH/event_table, keyed
+           by the dblock path and JSON header (which carries the
+           dblock uuid) and fingerprints of the parsed code map and
+           header map. Editing the code map or header map re-sweeps
+           only the dblocks whose key changed, stale entries are left
+           in place until clear_cache("event_table"). If the mkh5 file
+           is not writeable, the events are found as usual with a
+           warning.
+
         """
 
         # instantiate the codemapper w/ its map and code finder
@@ -1058,112 +1235,75 @@ class mkh5:
             )
             warnings.warn(msg)
 
-        # set up to extract info from the header
-        hio = self.HeaderIO()
-        if header_map_f is not None:
-            hio.set_slicer(header_map_f)
+        is_n_jobs = isinstance(n_jobs, (int, np.integer))
+        if not (is_n_jobs and (n_jobs >= 1 or n_jobs == -1)):
+            msg = f"n_jobs must be a positive integer or -1 not {n_jobs}"
+            raise ValueError(msg)
+        if n_jobs == -1:
+            n_jobs = os.cpu_count()
 
         # fetch all data that have at least one mkh5 datablock (dblock_0)
-        match_list = []
-        dgroup_paths = h5tools.get_data_group_paths(self.h5_fname)
-        with h5py.File(self.h5_fname, "r") as h5:
-            for dgp in dgroup_paths:
-                dblock_paths = h5tools.get_dblock_paths(self.h5_fname, dgp)
-                for dbp in dblock_paths:
-                    assert dgp in dbp  # group and data block must agree
-                    hio.get(h5[dbp])  # need this for srate at least
-
-                    # slice the header if there is an extractor
-                    if hio._slicer is not None:
-                        hdr_data = hio.get_slices()
-                    else:
-                        hdr_data = []
-
-                    print("searching codes in: " + dbp)
-                    event_idxs = (
-                        h5[dbp]["log_evcodes"] != 0
-                    )  # samples w/ non-zero events
-                    dblock_ticks = h5[dbp]["dblock_ticks"][event_idxs]
-                    crw_ticks = h5[dbp]["crw_ticks"][event_idxs]
-                    raw_evcodes = h5[dbp]["raw_evcodes"][event_idxs]
-                    log_evcodes = h5[dbp]["log_evcodes"][event_idxs]
-                    log_ccodes = h5[dbp]["log_ccodes"][event_idxs]
-                    log_flags = h5[dbp]["log_flags"][event_idxs]
-                    # iterate on keys which are the code patterns
-                    for idx, cm in ctagger.code_map.iterrows():
-                        # matches is a list of lists of dict, one dict for each group
-                        code_pattern_matches = ctagger._find_evcodes(
-                            cm["regexp"], dblock_ticks, log_evcodes
-                        )
-
-                        if code_pattern_matches is not None:
-                            for m in code_pattern_matches:
-                                for mm in m:
-                                    match_tick, anchor_tick, is_anchor = (
-                                        None,
-                                        None,
-                                        None,
-                                    )
-                                    for k, v in mm:
-                                        if k == "match_tick":
-                                            match_tick = v
-                                        if k == "anchor_tick":
-                                            anchor_tick = v
-                                        if k == "is_anchor":
-                                            is_anchor = v
-                                    assert all(
-                                        [
-                                            v is not None
-                                            for v in [
-                                                match_tick,
-                                                anchor_tick,
-                                                is_anchor,
-                                            ]
-                                        ]
-                                    )
-
-                                    if is_anchor:
-                                        assert anchor_tick == match_tick
-                                    else:
-                                        assert anchor_tick != match_tick
-
-                                    # ok, this is the tick of the pattern match
-                                    # and it must be unique
-                                    tick_idx = np.where(dblock_ticks == match_tick)[0]
-                                    assert len(tick_idx) == 1
-
-                                    sample_data = [
-                                        # ("Index", idx),
-                                        ("data_group", dgp),
-                                        ("dblock_path", dbp),
-                                        ("dblock_tick_idx", tick_idx[0]),
-                                        ("dblock_ticks", dblock_ticks[tick_idx][0]),
-                                        ("crw_ticks", crw_ticks[tick_idx][0]),
-                                        ("raw_evcodes", raw_evcodes[tick_idx][0]),
-                                        ("log_evcodes", log_evcodes[tick_idx][0]),
-                                        ("log_ccodes", log_ccodes[tick_idx][0]),
-                                        ("log_flags", log_flags[tick_idx][0]),
-                                        (
-                                            "epoch_match_tick_delta",
-                                            0,
-                                        ),  # an event is a one sample epoch
-                                        ("epoch_ticks", 1),
-                                        (
-                                            "dblock_srate",
-                                            hio.header["samplerate"],
-                                        ),  # for conversion to times
-                                    ]
+        dblock_paths = [
+            (dgp, dbp)
+            for dgp in h5tools.get_data_group_paths(self.h5_fname)
+            for dbp in h5tools.get_dblock_paths(self.h5_fname, dgp)
+        ]
 
-                                    # extend sample data w/ the header information
-                                    # which may be None
-                                    sample_data = sample_data + hdr_data
+        # look up the dblocks already swept with this code map and header map
+        events = dict()
+        if cache:
+            with h5py.File(self.h5_fname, "r") as h5:
+                cache_keys = self._event_table_cache_keys(
+                    h5, ctagger, header_map_f, dblock_paths
+                )
+                for dbp, cache_key in cache_keys.items():
+                    cache_path = f"{mkh5.CACHE_PATH}/event_table/{cache_key}"
+                    if cache_path in h5:
+                        events[dbp] = mkh5._json_to_event_rows(h5[cache_path][()])
+        sweep_paths = [(dgp, dbp) for dgp, dbp in dblock_paths if dbp not in events]
+
+        # sweep the code map across the rest, in parallel runs of
+        # dblocks if n_jobs > 1
+        swept = dict()
+        if n_jobs == 1 or len(sweep_paths) < 2:
+            dblocks_events = self._get_dblocks_events(
+                ctagger, header_map_f, sweep_paths
+            )
+            for dbp, dblock_events in dblocks_events:
+                print("searching codes in: " + dbp)
+                swept[dbp] = dblock_events
+        else:
+            n_tasks = min(4 * n_jobs, len(sweep_paths))
+            tasks = [
+                (self, ctagger, header_map_f, [sweep_paths[i] for i in run])
+                for run in np.array_split(np.arange(len(sweep_paths)), n_tasks)
+            ]
+            with multiprocessing.Pool(min(n_jobs, n_tasks)) as pool:
+                for dblocks_events in pool.imap(_get_event_table_worker, tasks):
+                    for dbp, dblock_events in dblocks_events:
+                        print("searching codes in: " + dbp)
+                        swept[dbp] = dblock_events
+        events.update(swept)
+
+        if cache and swept:
+            try:
+                with h5py.File(self.h5_fname, "r+") as h5:
+                    for dbp, dblock_events in swept.items():
+                        cache_path = f"{mkh5.CACHE_PATH}/event_table/{cache_keys[dbp]}"
+                        if cache_path not in h5:
+                            cached = h5.create_dataset(
+                                cache_path,
+                                data=mkh5._event_rows_to_json(dblock_events),
+                            )
+                            cached.attrs["dblock_path"] = dbp
+            except (OSError, TypeError) as fail:
+                msg = f"event table not cached in {self.h5_fname}: {fail}"
+                warnings.warn(msg)
 
-                                    # extend sample_data w/ the match info and code map row
-                                    sample_data = (
-                                        sample_data + mm + list(zip(cm.index, cm))
-                                    )
-                                    match_list.append((sample_data))  # list of tuples
-                                    # pprint.pprint(match_list)
+        # the matches are collected in dblock order
+        match_list = []
+        for dgp, dbp in dblock_paths:
+            match_list.extend(events[dbp])
 
         # handle no matches ...
         if len(match_list) > 0:
@@ -1182,6 +1322,311 @@ class mkh5:
         else:
             raise RuntimeError("uh oh ... no events found for {0}".format(code_map_f))
 
+    def event_counts(self, by=["data_group", "log_ccodes"]):
+        """count the event codes in the mkh5 file for event code QA
+
+        Parameters
+        ----------
+        by : list of str {"data_group", "dblock_path", "log_ccodes"}
+            count the event codes separately for each combination of
+            these
+
+        Returns
+        -------
+        counts : pandas.DataFrame
+           one row for each log_evcode in each `by` group with columns
+
+           * the `by` columns and log_evcodes
+
+           * count: number of events
+
+           * first_dblock_path, first_dblock_ticks,
+             last_dblock_path, last_dblock_ticks: where the first
+             and last events are, in acquisition order
+
+           * iei_mean, iei_std, iei_min, iei_median, iei_max: the
+             intervals, in samples, between successive events with
+             the same code in the same dblock, NaN if there are none
+
+
+        Only the log_evcodes column of each dblock is read, and
+        log_ccodes if counting by them. The dblock_ticks are the
+        sample indices of the events in the dblock.
+
+        Example
+
+        .. code-block:: python
+
+           > myh5.event_counts()  # by data group and condition code
+           > myh5.event_counts(by=["dblock_path"])
+           > myh5.event_counts(by=[])  # all data groups together
+
+        """
+        by_cols = ["data_group", "dblock_path", "log_ccodes"]
+        if isinstance(by, str):
+            by = [by]
+        by = list(by)
+        if not (set(by) <= set(by_cols) and len(set(by)) == len(by)):
+            raise ValueError(f"by must be a list of columns in {by_cols} not {by}")
+
+        events = []
+        with h5py.File(self.h5_fname, "r") as h5:
+            for dgp in h5tools.get_data_group_paths(self.h5_fname):
+                for dbp in h5tools.get_dblock_paths(self.h5_fname, dgp):
+                    log_evcodes = h5[dbp]["log_evcodes"]
+                    event_ticks = np.flatnonzero(log_evcodes)
+                    dblock_events = {
+                        "data_group": dgp,
+                        "dblock_path": dbp,
+                        "dblock_ticks": event_ticks,
+                        "log_evcodes": log_evcodes[event_ticks],
+                    }
+                    if "log_ccodes" in by:
+                        log_ccodes = h5[dbp]["log_ccodes"]
+                        dblock_events["log_ccodes"] = log_ccodes[event_ticks]
+                    events.append(pd.DataFrame(dblock_events))
+
+        keys = by + ["log_evcodes"]
+        columns = keys + [
+            "count",
+            "first_dblock_path",
+            "first_dblock_ticks",
+            "last_dblock_path",
+            "last_dblock_ticks",
+            "iei_mean",
+            "iei_std",
+            "iei_min",
+            "iei_median",
+            "iei_max",
+        ]
+        if len(events) == 0:
+            return pd.DataFrame(columns=columns)
+        events = pd.concat(events, ignore_index=True)
+
+        # intervals between successive same codes are within dblocks
+        iei_keys = list(dict.fromkeys(["dblock_path"] + keys))
+        events["iei"] = events.groupby(iei_keys, sort=False)["dblock_ticks"].diff()
+
+        counts = events.groupby(keys).agg(
+            count=("dblock_ticks", "size"),
+            first_dblock_path=("dblock_path", "first"),
+            first_dblock_ticks=("dblock_ticks", "first"),
+            last_dblock_path=("dblock_path", "last"),
+            last_dblock_ticks=("dblock_ticks", "last"),
+            iei_mean=("iei", "mean"),
+            iei_std=("iei", "std"),
+            iei_min=("iei", "min"),
+            iei_median=("iei", "median"),
+            iei_max=("iei", "max"),
+        )
+        # the group index upcasts the codes, restore the dblock dtypes
+        code_cols = [col for col in keys if col in ["log_evcodes", "log_ccodes"]]
+        code_dtypes = {col: events[col].dtype for col in code_cols}
+        return counts.reset_index().astype(code_dtypes)[columns]
+
+    def _get_dblocks_events(self, ctagger, header_map_f, dblock_paths):
+        """sweep the code map across dblocks, see get_event_table()
+
+        Parameters
+        ----------
+        ctagger : CodeTagger
+        header_map_f : str or None
+            YAML header extractor file
+        dblock_paths : list of (str, str)
+            (data group path, dblock path) of each dblock to sweep
+
+        Yields
+        ------
+        dbp, dblock_events : str, list
+            dblock path and its event table rows, a list of (key, value)
+            tuples for each matched code
+
+        """
+        # set up to extract info from the header
+        hio = self.HeaderIO()
+        if header_map_f is not None:
+            hio.set_slicer(header_map_f)
+
+        # the code map rows are swept across every dblock
+        code_map_rows = list(ctagger.code_map.iterrows())
+
+        with h5py.File(self.h5_fname, "r") as h5:
+            for dgp, dbp in dblock_paths:
+                dblock_events = []
+                assert dgp in dbp  # group and data block must agree
+                hio.get(h5[dbp])  # need this for srate at least
+
+                # slice the header if there is an extractor
+                if hio._slicer is not None:
+                    hdr_data = hio.get_slices()
+                else:
+                    hdr_data = []
+
+                event_idxs = h5[dbp]["log_evcodes"] != 0  # samples w/ non-zero events
+                dblock_ticks = h5[dbp]["dblock_ticks"][event_idxs]
+                crw_ticks = h5[dbp]["crw_ticks"][event_idxs]
+                raw_evcodes = h5[dbp]["raw_evcodes"][event_idxs]
+                log_evcodes = h5[dbp]["log_evcodes"][event_idxs]
+                log_ccodes = h5[dbp]["log_ccodes"][event_idxs]
+                log_flags = h5[dbp]["log_flags"][event_idxs]
+
+                # index the codes once for all the code patterns
+                event_codes = EventCodes(log_evcodes)
+
+                # iterate on keys which are the code patterns
+                for idx, cm in code_map_rows:
+                    # matches is a list of lists of dict, one dict for each group
+                    code_pattern_matches = ctagger._find_evcodes(
+                        cm["regexp"], dblock_ticks, log_evcodes, event_codes
+                    )
+
+                    if code_pattern_matches is not None:
+                        for m in code_pattern_matches:
+                            for mm in m:
+                                match_tick, anchor_tick, is_anchor = (
+                                    None,
+                                    None,
+                                    None,
+                                )
+                                for k, v in mm:
+                                    if k == "match_tick":
+                                        match_tick = v
+                                    if k == "anchor_tick":
+                                        anchor_tick = v
+                                    if k == "is_anchor":
+                                        is_anchor = v
+                                assert all(
+                                    [
+                                        v is not None
+                                        for v in [
+                                            match_tick,
+                                            anchor_tick,
+                                            is_anchor,
+                                        ]
+                                    ]
+                                )
+
+                                if is_anchor:
+                                    assert anchor_tick == match_tick
+                                else:
+                                    assert anchor_tick != match_tick
+
+                                # ok, this is the tick of the pattern match
+                                # and it must be unique
+                                tick_idx = np.where(dblock_ticks == match_tick)[0]
+                                assert len(tick_idx) == 1
+
+                                sample_data = [
+                                    # ("Index", idx),
+                                    ("data_group", dgp),
+                                    ("dblock_path", dbp),
+                                    ("dblock_tick_idx", tick_idx[0]),
+                                    ("dblock_ticks", dblock_ticks[tick_idx][0]),
+                                    ("crw_ticks", crw_ticks[tick_idx][0]),
+                                    ("raw_evcodes", raw_evcodes[tick_idx][0]),
+                                    ("log_evcodes", log_evcodes[tick_idx][0]),
+                                    ("log_ccodes", log_ccodes[tick_idx][0]),
+                                    ("log_flags", log_flags[tick_idx][0]),
+                                    (
+                                        "epoch_match_tick_delta",
+                                        0,
+                                    ),  # an event is a one sample epoch
+                                    ("epoch_ticks", 1),
+                                    (
+                                        "dblock_srate",
+                                        hio.header["samplerate"],
+                                    ),  # for conversion to times
+                                ]
+
+                                # extend sample data w/ the header information
+                                # which may be None
+                                sample_data = sample_data + hdr_data
+
+                                # extend sample_data w/ the match info and code map row
+                                sample_data = sample_data + mm + list(zip(cm.index, cm))
+                                dblock_events.append((sample_data))  # list of tuples
+                                # pprint.pprint(match_list)
+                yield dbp, dblock_events
+
+    def _event_table_cache_keys(self, h5, ctagger, header_map_f, dblock_paths):
+        """fingerprint the code map sweep of each dblock for looking up cached events
+
+        Parameters
+        ----------
+        h5 : h5py.File
+           open, readable mkh5 file
+        ctagger : CodeTagger
+        header_map_f : str or None
+           YAML header extractor file
+        dblock_paths : list of (str, str)
+           (data group path, dblock path) of each dblock
+
+        Returns
+        -------
+        cache_keys : dict
+           dblock path: sha256 hex digest of the mkpy version, dblock
+           path and JSON header, parsed code map, and parsed header
+           map. The header carries the dblock uuid so the key changes
+           if the dblock does.
+
+        """
+        code_map = ctagger.code_map
+        code_map_hash = hashlib.md5(
+            json.dumps(
+                [
+                    code_map.to_json(orient="split"),
+                    [str(dtype) for dtype in code_map.dtypes],
+                ]
+            ).encode("utf8")
+        ).hexdigest()
+
+        hio = self.HeaderIO()
+        if header_map_f is not None:
+            hio.set_slicer(header_map_f)
+        header_map_hash = hashlib.md5(
+            json.dumps(hio._slicer, sort_keys=True, default=str).encode("utf8")
+        ).hexdigest()
+
+        cache_keys = dict()
+        for dgp, dbp in dblock_paths:
+            json_header = h5[dbp].attrs["json_header"]
+            fingerprint = [
+                __version__,
+                dbp,
+                hashlib.md5(json_header.encode("utf8")).hexdigest(),
+                code_map_hash,
+                header_map_hash,
+            ]
+            cache_keys[dbp] = hashlib.sha256(
+                json.dumps(fingerprint).encode("utf8")
+            ).hexdigest()
+        return cache_keys
+
+    def _event_rows_to_json(dblock_events):
+        """serialize event table rows for the cache, numpy scalars keep their dtype"""
+
+        def to_json(value):
+            if isinstance(value, np.generic):
+                return {"__numpy__": value.dtype.str, "value": value.item()}
+            raise TypeError(f"cannot cache event table value {value!r}")
+
+        return json.dumps(dblock_events, default=to_json)
+
+    def _json_to_event_rows(json_events):
+        """inverse of _event_rows_to_json()"""
+
+        def from_json(obj):
+            if "__numpy__" in obj:
+                return np.dtype(obj["__numpy__"]).type(obj["value"])
+            return obj
+
+        if isinstance(json_events, bytes):
+            json_events = json_events.decode("utf8")
+        return [
+            [tuple(item) for item in row]
+            for row in json.loads(json_events, object_hook=from_json)
+        ]
+
     def _h5_check_events(self, h5_f, e_table):
         """check the match event in event or epoch table agrees with the
            dblock data
@@ -1247,23 +1692,36 @@ class mkh5:
                 msg += "  is missing, all these are mandatory:" + " ".join(min_cols)
                 raise RuntimeError(msg)
 
-        with h5py.File(h5_f, "r") as h5:
-            for index, e in e_table.iterrows():
-                # These should only fail if the datablocks or event table have
-                # been monkeyed with. Anyone who can do that can chase down
-                # the assertion exception.
+        # These should only fail if the datablocks or event table have
+        # been monkeyed with. Anyone who can do that can chase down
+        # the assertion exception.
+        dblock_paths = e_table["dblock_path"].to_numpy()
+        data_groups = e_table["data_group"].to_numpy()
+        assert all([dg in dbp for dg, dbp in zip(data_groups, dblock_paths)])
 
-                data = h5[e["dblock_path"]][e["dblock_ticks"]]
-                assert e["data_group"] in e["dblock_path"]
+        # the log event code must be an anchor or a match and anchors
+        # are matches, so it is always the match_code
+        match_codes = e_table["match_code"].to_numpy()
 
-                # the log event code must be an anchor or a match
-                if e["match_code"] != e["anchor_code"]:
-                    assert e["match_code"] == data["log_evcodes"]
-                else:
-                    assert e["anchor_code"] == data["log_evcodes"]
-                check_cols = [col for col in e.index if col in data.dtype.names]
+        # one sorted fancy-index read per dblock for the rows and
+        # columns to check, then whole-column comparisons
+        with h5py.File(h5_f, "r") as h5:
+            dblock_rows = e_table.groupby("dblock_path", sort=False).indices
+            for dbp, row_idxs in dblock_rows.items():
+                h5_dbp = dbp.decode("utf8") if isinstance(dbp, bytes) else dbp
+                dblock = h5[h5_dbp]
+                check_cols = [c for c in e_table.columns if c in dblock.dtype.names]
+                if "log_evcodes" not in check_cols:
+                    check_cols.append("log_evcodes")
+
+                ticks = e_table["dblock_ticks"].to_numpy()[row_idxs].astype("int64")
+                read_ticks, tick_idxs = np.unique(ticks, return_inverse=True)
+                data = dblock.fields(check_cols)[read_ticks][tick_idxs]
+
+                assert all(match_codes[row_idxs] == data["log_evcodes"])
                 for col in check_cols:
-                    assert data[col] == e[col]
+                    if col in e_table.columns:
+                        assert all(e_table[col].to_numpy()[row_idxs] == data[col])
 
     def _check_epochs_table(self, epochs_table):
         """check a set epochs table for event codes, epoch length, and offset
@@ -1287,12 +1745,23 @@ class mkh5:
 
         """
 
-        epoch_required_columns = ["epoch_ticks", "epoch_match_tick_delta"]
-
         # epochs tables are an extension of event tables, check the events first
         self._h5_check_events(self.h5_fname, epochs_table)
 
         # then epoch length and matched code offset (in samples)
+        self._check_epochs_intervals(epochs_table)
+
+    def _check_epochs_intervals(self, epochs_table):
+        """check the epochs table epoch length and matched code offset columns
+
+        Raises
+        ------
+           ValueError
+             if the columns are missing or the values are not uniform
+             across the epochs.
+
+        """
+        epoch_required_columns = ["epoch_ticks", "epoch_match_tick_delta"]
         for c in epoch_required_columns:
             if c not in epochs_table.dtype.names:
                 msg = "epochs table missing required column {0}".format(c)
@@ -1329,7 +1798,15 @@ class mkh5:
         eptbl = self.get_epochs_table(epochs_table_name, format="numpy")
         self._check_epochs_table(eptbl)
 
-    def set_epochs(self, epochs_table_name, event_table, tmin_ms, tmax_ms):
+    def set_epochs(
+        self,
+        epochs_table_name,
+        event_table,
+        tmin_ms,
+        tmax_ms,
+        virtual=False,
+        compact=False,
+    ):
         """construct and store a named EEG epochs lookup-table in self['epcochs']
 
         For storing in hdf5 the columns must be one of these:
@@ -1353,6 +1830,14 @@ class mkh5:
             epoch end in millseconds relative to the event, e..g,
             1500, strictly greater than tmin_ms
 
+        virtual : bool {False}
+            if True also store the epochs data as an hdf5 virtual
+            dataset, see Notes.
+
+        compact : bool {False}
+            if True store low-cardinality string columns as integer
+            codes and a lookup table, see Notes.
+
         Returns
         -------
         None
@@ -1377,18 +1862,83 @@ class mkh5:
         to the revise the epochs, rebuild the mkh5 file from crws/logs
         with the ones you want.
 
+        With virtual=True the epochs data are also mapped into an hdf5
+        virtual dataset, h5_f/EPOCH_VIRTUAL_PATH/epochs_table_name
+        with shape (n_epochs, epoch_ticks), i.e., one row per row of
+        the epochs table. Each row references the epoch interval in
+        the source `dblock_N` so the virtual dataset takes no extra
+        storage and reads like any other 2-D hdf5 array of the dblock
+        data streams in MATLAB, R, h5py, etc.. As in get_epochs() the
+        float16 EEG streams are upcast to float32 on read.
+
+        With compact=True string columns that repeat a few values,
+        e.g., `dblock_path`, `data_group`, code map tags, are stored
+        as uint8 or uint16 indexes into the sorted unique values,
+        h5_f/EPOCH_LEVELS_PATH/epochs_table_name/column. A column is
+        coded only if the codes and the lookup table take less space
+        than the fixed-width bytes. get_epochs_table(), get_epochs()
+        etc. decode the columns so the epochs table reads back the
+        same either way.
+
+        """
+        self.set_epochs_multi(
+            event_table,
+            {epochs_table_name: (tmin_ms, tmax_ms)},
+            virtual=virtual,
+            compact=compact,
+        )
+        return None  # ok
+
+    def set_epochs_multi(
+        self, event_table, epochs_intervals, virtual=False, compact=False
+    ):
+        """construct and store several named epochs tables from one event table
+
+        Parameters
+        ----------
+        event_table : pandas.DataFrame
+            as returned by mkh5.get_event_table()
+
+        epochs_intervals : dict
+            epochs_table_name: (tmin_ms, tmax_ms) for each epochs
+            table, e.g., {"p3_short": (-100, 600), "p3_long": (-500, 1500)}
+
+        virtual : bool {False}
+            if True also store each epochs table's data as an hdf5
+            virtual dataset, see set_epochs()
+
+        compact : bool {False}
+            if True store low-cardinality string columns as integer
+            codes and a lookup table, see set_epochs()
+
+        Returns
+        -------
+        None
+            updates h5_f/EPOCH_TABLES_PATH/ with the named epoch table h5py.Dataset
+
+
+        Notes
+        -----
+
+        The same as calling set_epochs() for each name and interval
+        except the event table is sanitized and checked against the
+        mkh5 data once for all the tables. The intervals are all
+        checked before any of the tables are stored.
+
         """
+
         with h5py.File(self.h5_fname, mode="r") as h5:
-            if (
-                mkh5.EPOCH_TABLES_PATH in h5.keys()
-                and epochs_table_name in h5[mkh5.EPOCH_TABLES_PATH].keys()
-            ):
-                msg = (
-                    f"epochs name {epochs_table_name} is in use, "
-                    f"pick another name or use reset_all() to "
-                    f"completely wipe the mkh5 file: {self.h5_fname}"
-                )
-                raise RuntimeError(msg)
+            for epochs_table_name in epochs_intervals:
+                if (
+                    mkh5.EPOCH_TABLES_PATH in h5.keys()
+                    and epochs_table_name in h5[mkh5.EPOCH_TABLES_PATH].keys()
+                ):
+                    msg = (
+                        f"epochs name {epochs_table_name} is in use, "
+                        f"pick another name or use reset_all() to "
+                        f"completely wipe the mkh5 file: {self.h5_fname}"
+                    )
+                    raise RuntimeError(msg)
 
         # event_table = self.get_event_table(code_map_f)
         if event_table is None:
@@ -1402,12 +1952,16 @@ class mkh5:
 
         # remap pandas 'O' dtype columns to hdf5 friendly np.arrays if
         # possible.  Run column-wise so exception messages are
-        # informative.  Run on a copy so the nan handler can mod the
-        # series in place, else pd warning "setting value on copy"
-        tidy_table = pd.DataFrame()
-        for c in event_table.columns:
-            tidy_table[c] = self._pd_series_to_hdf5(event_table[c].copy())
-        event_table = tidy_table
+        # informative. Only 'O' columns are copied, so the nan handler
+        # can mod them in place, and the arrays are not collected into a
+        # new DataFrame which would copy them again and revert bytes to 'O'
+        n_events = len(event_table)
+        event_table = {
+            c: self._pd_series_to_hdf5(
+                event_table[c].copy() if event_table[c].dtype == "O" else event_table[c]
+            )
+            for c in event_table.columns
+        }
 
         # 2. define a numpy compound data type to hold the event_table
         # info and region refs
@@ -1419,7 +1973,7 @@ class mkh5:
 
         # continue new dtype for event info columns, mapped to hdf5 compatible np.dtype
         # event_table_types = [event_table[c].dtype for c in event_table.columns]
-        for i, c in enumerate(event_table.columns):
+        for i, c in enumerate(event_table.keys()):
             epoch_dt_names.append(c)
             epoch_dt_types.append(event_table[c].dtype.__str__())
 
@@ -1437,111 +1991,292 @@ class mkh5:
 
         # construct the new dtype and initialize epochs table array
         epoch_dt = np.dtype(list(zip(epoch_dt_names, epoch_dt_types)))
-        epochs = np.zeros(shape=(len(event_table),), dtype=epoch_dt)
+        all_epochs = np.zeros(shape=(n_events,), dtype=epoch_dt)
 
         # set the epoch_id counting index and copy the tidied event table
-        epochs["epoch_id"] = [idx for idx in range(len(event_table))]
-        for c in event_table.columns:
-            epochs[c] = event_table[c]
+        all_epochs["epoch_id"] = np.arange(n_events)
+        for c in event_table.keys():
+            all_epochs[c] = event_table[c]
 
         # 3. time lock each epoch to the match tick, and set the
         #    interval from the function arguments
         hio = self.HeaderIO()
 
         # fetch sampling rate
-        srates = np.unique(epochs["dblock_srate"])
+        srates = np.unique(all_epochs["dblock_srate"])
         assert len(srates) == 1, "epochs['dblock_srate'] varies"
         srate = srates[0]
 
-        # scalar epoch start offset and duration in samples
-        epoch_match_tick_delta = mkh5._ms2samp(tmin_ms, srate)
-        duration_samps = mkh5._ms2samp(tmax_ms - tmin_ms, srate)
-
-        # (variable) match_tick in place from the event table, set
-        # set the (constant) offset and duration columns
-        epochs["epoch_match_tick_delta"] = epoch_match_tick_delta
-        epochs["epoch_ticks"] = duration_samps
-
         # update the timestamps
-        epochs["match_time"] = int(0)
-        epochs["anchor_time_delta"] = np.array(
+        all_epochs["match_time"] = int(0)
+        all_epochs["anchor_time_delta"] = np.array(
             [
                 int(mkh5._samp2ms(atd, srate))
-                for atd in epochs[
+                for atd in all_epochs[
                     "anchor_tick_delta"
                 ]  # epochs["match_tick"] - e["anchor_tick"]
             ]
         )
         # anchor_time == anchor_time_delta here at  match_time = 0, tho
         # varies by time in epochs data
-        epochs["anchor_time"] = epochs["anchor_time_delta"]
+        all_epochs["anchor_time"] = all_epochs["anchor_time_delta"]
 
         # new 0.2.4, discrete time interval (DITI) time lock, shift, length
         # columns. Redundant for now, included for future DITI tagging
-        epochs["diti_t_0"] = epochs["match_tick"]
-        epochs["diti_hop"] = epoch_match_tick_delta
-        epochs["diti_len"] = duration_samps
+        all_epochs["diti_t_0"] = all_epochs["match_tick"]
 
-        # ------------------------------------------------------------
-        # error check
-        # whitelist in bound epochs  FIX ME ... no need to iterate
-        is_in_bounds = np.zeros(len(epochs)).astype(bool)
-        start_samps = epochs["match_tick"] + epoch_match_tick_delta
-        with h5py.File(self.h5_fname, "r+") as h5:
-            # for i,e in event_table.iterrows():
-            for i, e in enumerate(epochs):
+        # fetch each dblock header and length once, not once per epoch
+        dblock_lens = np.zeros(len(all_epochs), dtype="int64")
+        with h5py.File(self.h5_fname, "r") as h5:
+            for dbp in np.unique(all_epochs["dblock_path"]):
+                h5_dbp = dbp.decode("utf8") if isinstance(dbp, bytes) else dbp
+                hio.get(h5[h5_dbp])
 
                 # check event table sampling rate agrees w/ dblock
-                dbp = e["dblock_path"]
-                hio.get(h5[dbp])
                 if srate != hio.header["samplerate"]:
+                    i = np.where(all_epochs["dblock_path"] == dbp)[0][0]
                     msg = (
                         "{0}['samplerate']: {1} does not match "
                         "event table[{2}]['dblock_samplerate': "
                         "{3}"
-                    ).format(dbp, hio.header["samplerate"], i, srate)
+                    ).format(h5_dbp, hio.header["samplerate"], i, srate)
                     raise ValueError(msg)
+                dblock_lens[all_epochs["dblock_path"] == dbp] = len(h5[h5_dbp])
 
-                # bounds check with messages per epoch
-                if duration_samps <= 0:
-                    msg = (
-                        "epoch interval {0} {1} is less than one sample at "
-                        "{3} ... increase the interval"
-                    ).format(tmin_ms, tmax_ms, srate)
-                    raise ValueError(msg)
+        # check the sanitized events once for all the epochs tables
+        self._h5_check_events(self.h5_fname, all_epochs)
+
+        epochs_tables = dict()
+        for epochs_table_name, (tmin_ms, tmax_ms) in epochs_intervals.items():
+            epochs = all_epochs.copy()
+
+            # scalar epoch start offset and duration in samples
+            epoch_match_tick_delta = mkh5._ms2samp(tmin_ms, srate)
+            duration_samps = mkh5._ms2samp(tmax_ms - tmin_ms, srate)
+
+            # (variable) match_tick in place from the event table, set
+            # set the (constant) offset and duration columns
+            epochs["epoch_match_tick_delta"] = epoch_match_tick_delta
+            epochs["epoch_ticks"] = duration_samps
+            epochs["diti_hop"] = epoch_match_tick_delta
+            epochs["diti_len"] = duration_samps
+
+            # ------------------------------------------------------------
+            # error check
+            if len(epochs) > 0 and duration_samps <= 0:
+                msg = (
+                    "epoch interval {0} {1} is less than one sample at "
+                    "{2} ... increase the interval"
+                ).format(tmin_ms, tmax_ms, srate)
+                raise ValueError(msg)
 
-                # move on after bounds check
-                if start_samps[i] < 0:
+            # whitelist in bound epochs
+            start_samps = epochs["match_tick"] + epoch_match_tick_delta
+            oob_left = start_samps < 0
+            oob_right = ~oob_left & (start_samps + duration_samps > dblock_lens)
+            is_in_bounds = ~(oob_left | oob_right)
+
+            # messages per out of bounds epoch
+            for i in np.where(~is_in_bounds)[0]:
+                if oob_left[i]:
                     warnings.warn(
                         "data error: pre-stimulus interval is out of bounds left ... "
-                        + "skipping epoch {0}".format(e)
+                        + "skipping epoch {0}".format(epochs[i])
                     )
-                    continue
-                elif start_samps[i] + duration_samps > len(h5[dbp]):
+                else:
                     warnings.warn(
                         "data error: post-stimulus interval is out of bounds right ... "
-                        + "skipping epoch {0}".format(e)
+                        + "skipping epoch {0}".format(epochs[i])
                     )
-                    continue
-                else:
-                    # if in bounds update epoch match offset
-                    is_in_bounds[i] = True
 
-        # drop out of bounds epochs and check epochs are consistent
-        epochs = epochs[is_in_bounds]
+            # drop out of bounds epochs and check the intervals to be stored
+            epochs_tables[epochs_table_name] = epochs[is_in_bounds]
+            self._check_epochs_intervals(epochs_tables[epochs_table_name])
 
-        # check the epochs for consistency
-        self._check_epochs_table(epochs)
+        # check the virtual datasets can be built before writing anything
+        if virtual:
+            with h5py.File(self.h5_fname, "r") as h5:
+                for epochs_table_name, epochs in epochs_tables.items():
+                    self._h5_check_virtual_epochs(h5, epochs_table_name, epochs)
 
-        # 4. add epoch table in the mkh5 file under /EPOCH_TABLES_PATH/epochs_table_name
+        # 4. add epoch tables in the mkh5 file under /EPOCH_TABLES_PATH/
         with h5py.File(self.h5_fname, "r+") as h5:
-            epochs_path = f"{mkh5.EPOCH_TABLES_PATH}/{epochs_table_name}"
-            ep = h5.create_dataset(epochs_path, data=epochs)
-            attrs = {"tmin_ms": tmin_ms, "tmax_ms": tmax_ms}
-            for k, v in attrs.items():
-                ep.attrs[k] = v
+            for epochs_table_name, epochs in epochs_tables.items():
+                epochs_path = f"{mkh5.EPOCH_TABLES_PATH}/{epochs_table_name}"
+                if compact:
+                    coded, levels = mkh5._encode_epochs_levels(epochs)
+                    ep = h5.create_dataset(epochs_path, data=coded)
+                    for col, col_levels in levels.items():
+                        levels_path = (
+                            f"{mkh5.EPOCH_LEVELS_PATH}/{epochs_table_name}/{col}"
+                        )
+                        h5.create_dataset(levels_path, data=col_levels)
+                else:
+                    ep = h5.create_dataset(epochs_path, data=epochs)
+                tmin_ms, tmax_ms = epochs_intervals[epochs_table_name]
+                attrs = {"tmin_ms": tmin_ms, "tmax_ms": tmax_ms}
+                for k, v in attrs.items():
+                    ep.attrs[k] = v
+
+                if virtual:
+                    self._h5_set_virtual_epochs(h5, epochs_table_name, epochs, attrs)
         return None  # ok
 
+    def _h5_check_virtual_epochs(self, h5, epochs_table_name, epochs):
+        """check the epochs can be stacked in an hdf5 virtual dataset
+
+        Parameters
+        ----------
+        h5 : h5py.File
+           the mkh5 file open for reading
+        epochs_table_name : str
+           name of the epochs table, for error messages
+        epochs : numpy structured array
+           the epochs table as stored by set_epochs()
+
+        Returns
+        -------
+        dblock_paths : list of str
+           the unique dblock paths the epochs come from
+        dblock_dtype : numpy.dtype
+           the data type shared by the dblocks
+
+        Raises
+        ------
+        ValueError
+           if there are no epochs or the dblock data types differ
+
+        """
+
+        if len(epochs) == 0:
+            raise ValueError(f"no epochs to map for {epochs_table_name}")
+
+        dblock_paths = [dbp.decode("utf8") for dbp in np.unique(epochs["dblock_path"])]
+        dblock_dtypes = set([h5[dbp].dtype for dbp in dblock_paths])
+        if len(dblock_dtypes) > 1:
+            msg = (
+                f"cannot stack virtual epochs {epochs_table_name}, the "
+                f"dblock data types differ: {dblock_dtypes}"
+            )
+            raise ValueError(msg)
+        return dblock_paths, dblock_dtypes.pop()
+
+    def _h5_set_virtual_epochs(self, h5, epochs_table_name, epochs, attrs):
+        """map epochs intervals onto their dblock rows in an hdf5 virtual dataset
+
+        Parameters
+        ----------
+        h5 : h5py.File
+           the mkh5 file open for writing
+        epochs_table_name : str
+           name of the epochs table, also used for the virtual dataset
+        epochs : numpy structured array
+           the epochs table as stored by set_epochs()
+        attrs : dict
+           set as the virtual dataset attrs
+
+        """
+
+        dblock_paths, dblock_dtype = self._h5_check_virtual_epochs(
+            h5, epochs_table_name, epochs
+        )
+
+        # upcast float16 EEG to float32, see _h5_get_epochs()
+        epoch_dtype = []
+        for name in dblock_dtype.names:
+            if dblock_dtype[name] == "float16":
+                epoch_dtype.append((name, "float32"))
+            else:
+                epoch_dtype.append((name, dblock_dtype[name]))
+        epoch_dtype = np.dtype(epoch_dtype)
+
+        # guard against irregular epochs
+        assert len(np.unique(epochs["epoch_ticks"])) == 1
+        nsamp = int(epochs["epoch_ticks"][0])
+
+        layout = h5py.VirtualLayout(shape=(len(epochs), nsamp), dtype=epoch_dtype)
+        sources = dict(
+            (dbp, h5py.VirtualSource(".", dbp, shape=h5[dbp].shape, dtype=dblock_dtype))
+            for dbp in dblock_paths
+        )
+        start_samps = epochs["match_tick"] + epochs["epoch_match_tick_delta"]
+        for i, (dbp, start) in enumerate(zip(epochs["dblock_path"], start_samps)):
+            layout[i] = sources[dbp.decode("utf8")][start : start + nsamp]
+
+        vds_path = f"{mkh5.EPOCH_VIRTUAL_PATH}/{epochs_table_name}"
+        vds = h5.create_virtual_dataset(vds_path, layout)
+        for k, v in attrs.items():
+            vds.attrs[k] = v
+
+    def _encode_epochs_levels(epochs):
+        """replace low-cardinality bytes columns with integer codes
+
+        Parameters
+        ----------
+        epochs : numpy structured array
+           the epochs table as built by set_epochs()
+
+        Returns
+        -------
+        coded : numpy structured array
+           the epochs table with the coded columns as uint8 or uint16
+        levels : dict
+           column name: bytes array of the sorted unique values, the
+           codes index this array
+
+        """
+        dts, levels, codes = [], dict(), dict()
+        for name in epochs.dtype.names:
+            col_dt = epochs.dtype[name]
+            if col_dt.kind == "S":
+                col_levels, col_codes = np.unique(epochs[name], return_inverse=True)
+                code_dt = np.min_scalar_type(max(len(col_levels) - 1, 0))
+                n_coded = code_dt.itemsize * len(epochs) + col_levels.nbytes
+                if code_dt.itemsize <= 2 and n_coded < col_dt.itemsize * len(epochs):
+                    levels[name] = col_levels
+                    codes[name] = col_codes
+                    col_dt = code_dt
+            dts.append((name, col_dt))
+
+        coded = np.empty(epochs.shape, dtype=dts)
+        for name in epochs.dtype.names:
+            coded[name] = codes[name] if name in codes else epochs[name]
+        return coded, levels
+
+    def _h5_read_epochs_table(h5, epochs_name):
+        """read an epochs table, decoding any compact columns back to bytes
+
+        Parameters
+        ----------
+        h5 : h5py.File
+           open, readable mkh5 file
+        epochs_name : str
+           name of a previously set epochs table
+
+        Returns
+        -------
+        epochs_table : numpy structured array
+           as stored by set_epochs(..., compact=False)
+
+        """
+        epochs_table = h5[f"{mkh5.EPOCH_TABLES_PATH}/{epochs_name}"][...]
+        levels_path = f"{mkh5.EPOCH_LEVELS_PATH}/{epochs_name}"
+        if levels_path not in h5:
+            return epochs_table
+
+        levels = dict((name, lvls[...]) for name, lvls in h5[levels_path].items())
+        dts = [
+            (name, levels[name].dtype if name in levels else epochs_table.dtype[name])
+            for name in epochs_table.dtype.names
+        ]
+        decoded = np.empty(epochs_table.shape, dtype=dts)
+        for name in epochs_table.dtype.names:
+            if name in levels:
+                decoded[name] = levels[name][epochs_table[name]]
+            else:
+                decoded[name] = epochs_table[name]
+        return decoded
+
     def export_event_table(self, event_table, event_table_f, format="feather"):
         """fetch the specified event table and save it in the specified format"""
         known_formats = ["feather", "txt"]  # txt is tab-separated
@@ -1660,17 +2395,6 @@ class mkh5:
 
         pd_bool_like = ["boolean"]
 
-        pd_type = pd.api.types.infer_dtype(
-            series, skipna=False
-        )  # mixed if missing values present
-        # pd_data_type = pd.api.types.infer_dtype(series.dropna()) # mixed if mixed data
-        pd_data_type = pd.api.types.infer_dtype(
-            series, skipna=True
-        )  # mixed if mixed data
-
-        series_types = pd.unique([type(i) for i in series.values])
-        data_types = pd.unique([type(i) for i in series.dropna().values])
-
         # homogonenous data w/ no missing values
 
         if series.dtype != "O":  #
@@ -1682,26 +2406,39 @@ class mkh5:
             assert arry.dtype != "O"
             return arry
         else:
+            pd_data_type = pd.api.types.infer_dtype(
+                series, skipna=True
+            )  # mixed if mixed data
+
+            # scan the value types only if pandas can't tell, e.g., str and bytes
+            if pd_data_type in pd_bytes_like + ["empty"]:
+                is_str_like = True
+            else:
+                data_types = pd.unique([type(i) for i in series.dropna().values])
+                is_str_like = all(
+                    [pd.api.types.is_string_dtype(dt) for dt in data_types]
+                )
+
             # white-list the allowed conversions, all else fails
 
             # any combination of str-like values +/- missing data -> bytes +/- 'NaN
-            if all([pd.api.types.is_string_dtype(dt) for dt in data_types]):
+            if is_str_like:
                 if series.hasnans:
                     series.fillna(".NAN", inplace=True)
-                # try each value to diagnosis if problem
-                for v in series.values:
-                    try:
-                        np.array([v]).astype(np.string_)
-                    except Exception as fail:
-                        msg = ("\nvalue: {0}\n" "column: {1}").format(v, series.name)
-                        print(msg)
-                        raise fail
 
-                # now try whole series
+                # try whole series, then each value to diagnose if problem
                 try:
                     arry = np.array(series.values.astype(np.string_))
                 except Exception as fail:
-                    print("column ", series.name)
+                    for v in series.values:
+                        try:
+                            np.array([v]).astype(np.string_)
+                        except Exception:
+                            msg = "\nvalue: {0}\ncolumn: {1}".format(v, series.name)
+                            print(msg)
+                            break
+                    else:
+                        print("column ", series.name)
                     raise fail
                 assert arry.dtype != "O"
                 return arry
@@ -1745,8 +2482,7 @@ class mkh5:
 
         epochs_table = None
         with h5py.File(self.h5_fname, "r") as h5:
-            epochs_path = f"{mkh5.EPOCH_TABLES_PATH}/{epochs_name}"
-            epochs_table = h5[epochs_path][...]
+            epochs_table = mkh5._h5_read_epochs_table(h5, epochs_name)
         if epochs_table is None:
             msg = "epochs table not found: {0}".format(epochs_name)
             raise RuntimeError(msg)
@@ -1779,7 +2515,55 @@ class mkh5:
             # eptbl.set_index("Index", inplace=True)
         return eptbl
 
-    def _h5_get_epochs(self, epochs_name, columns=None):
+    def _h5_select_epochs(self, h5, epochs_name, where=None):
+        """read the rows of the epochs table to extract
+
+        Parameters
+        ----------
+        h5 : h5py.File
+           open, readable mkh5 file
+        epochs_name : str
+           name of a previously set epochs table
+        where : str or None
+           pandas.DataFrame.query() expression, see _h5_get_epochs()
+
+        Returns
+        -------
+        epoch_table : numpy structured array
+           the selected rows in epochs table order
+
+        """
+        epochs_path = f"{mkh5.EPOCH_TABLES_PATH}/{epochs_name}"
+        epoch_view = h5[epochs_path]
+
+        # guard against irregular epochs
+        assert len(np.unique(epoch_view["epoch_ticks"])) == 1
+        assert len(np.unique(epoch_view["epoch_match_tick_delta"])) == 1
+        epoch_table = mkh5._h5_read_epochs_table(h5, epochs_name)
+
+        if where is not None:
+            # query a plain DataFrame of the table just read, decoding
+            # only the bytestring columns, the stored table was checked
+            # by set_epochs()
+            eptbl = pd.DataFrame(
+                {
+                    c: (
+                        np.char.decode(epoch_table[c], "utf8")
+                        if epoch_table.dtype[c].kind == "S"
+                        else epoch_table[c]
+                    )
+                    for c in epoch_table.dtype.names
+                }
+            )
+            is_selected = eptbl.eval(where).to_numpy(dtype=bool)
+            epoch_table = epoch_table[is_selected]
+            if len(epoch_table) == 0:
+                warnings.warn(f"no epochs in {epochs_name} where {where}")
+        return epoch_table
+
+    def _h5_get_epochs(
+        self, epochs_name, columns=None, decimate=1, where=None, epoch_table=None
+    ):
         """merge datablock segments (event codes, EEG) with code tags and timestamps.
 
         Each row (1, n) in the epochs table is broadcast to an (m, n)
@@ -1795,12 +2579,24 @@ class mkh5:
             name of epochs table Dataset in h5['epochs']
         columns : list of strings, default = None extracts all
             column names to extract
+        decimate : int, default = 1
+            keep every `decimate`-th sample, counting from the
+            *matched* event, after low-pass filtering the EEG streams
+            with `_decimation_fir()`
+        where : str, default = None extracts all
+            pandas.DataFrame.query() expression evaluated on the
+            epochs table to select the epochs to extract
+        epoch_table : numpy structured array, default = None
+            rows of the epochs table to extract, grouped by dblock,
+            as selected by _h5_select_epochs(). If given, `where`
+            is not applied again
 
         Yields
         ------
         epoch : numpy structured array shape = (m, n + 2) where
 
-           * m == `epoch_table['epoch_ticks']`, the length of the epoch in samples
+           * m == `epoch_table['epoch_ticks']`, the length of the epoch in samples,
+             or the number of samples kept when decimating
 
            * n == the number of columns in `epoch_table`
 
@@ -1823,122 +2619,310 @@ class mkh5:
         Iterating over this generator will fetch all the epochs given
         in epochs_name
 
-        .. TO DO: implement hdf5 region refs
+        Consecutive epochs from the same dblock are read as one span
+        of samples so each dblock is read, and low-pass filtered if
+        decimating, once, not once per epoch. Without decimating, a
+        new span starts wherever the gap between epochs is longer
+        than an epoch, so the samples between sparse epochs, e.g.,
+        after a `where` query, are not read. When decimating, the
+        span is padded with the neighboring dblock samples (or the
+        first, last sample at the edges of the dblock) so the FIR
+        has no edge effects inside the epochs. Only the float EEG
+        streams are filtered, the integer streams (event codes,
+        flags, pygarv) are subsampled so event codes between the
+        kept samples are dropped.
+
+        The `where` query and `columns` selection are applied before
+        reading any dblock data so only the data streams in `columns`
+        for the epochs that pass the query are read.
+
+        For access to the epochs data streams without extraction,
+        see set_epochs(..., virtual=True)
 
         """
 
         with h5py.File(self.h5_fname, "r") as h5:
-            epochs_path = f"{mkh5.EPOCH_TABLES_PATH}/{epochs_name}"
-            epoch_view = h5[epochs_path]
-            epoch_cols = epoch_view.dtype.names
-
-            # guard against irregular epochs
-            assert len(np.unique(epoch_view["epoch_ticks"])) == 1
-            assert len(np.unique(epoch_view["epoch_match_tick_delta"])) == 1
-            for e in epoch_view:
-
-                nsamp = e["epoch_ticks"]
-
-                # fill nsamp rows x event info columns
-                event_info = np.stack([e for n in range(nsamp)], axis=0)
-
-                # set for epoch slice
-                start, stop = None, None
-                start_samp = e["match_tick"] + e["epoch_match_tick_delta"]
-                stop_samp = start_samp + nsamp
-                epoch_streams = h5[e["dblock_path"]][start_samp:stop_samp]
-
-                # upconvert EEG columns float16 to float32 b.c. 2 byte floats
-                # fight w/ feather (unsupported datatype), MATLAB
-                # (cannot co-mingle w/ int64)
-                f4_streams_dtype = []
-                for name in epoch_streams.dtype.names:
-                    if epoch_streams.dtype[name] == "float16":
-                        f4_streams_dtype.append((name, "float32"))
-                    else:
-                        f4_streams_dtype.append((name, epoch_streams.dtype[name]))
-                f4_streams_dtype = np.dtype(f4_streams_dtype)
-                epoch_streams = np.array(epoch_streams, dtype=f4_streams_dtype)
-
-                # merge epoch table, match_time, and datablock stream table column names
-                all_cols = list(event_info.dtype.names)
-                for c in epoch_streams.dtype.names:
-                    if c not in all_cols:
-                        all_cols.append(c)
-
-                # use all available columns (default) or specified subset
-                if columns is None:
-                    epoch_dt_names = all_cols
-                else:
-                    for c in columns:
-                        if not c in all_cols:
-                            msg = "column {0} not found in epoch table or data block: ".format(
-                                c
-                            )
-                            msg += " ".join(all_cols)
-                            raise RuntimeError(msg)
-                    epoch_dt_names = columns
+            if epoch_table is None:
+                epoch_table = self._h5_select_epochs(h5, epochs_name, where)
+            if len(epoch_table) == 0:
+                return
+
+            # split the epochs table into runs of epochs from the same dblock
+            for run_idxs in mkh5._get_epoch_runs(epoch_table):
+                run = epoch_table[run_idxs]
+
+                nsamp = run["epoch_ticks"][0]
+
+                # epoch slices, keep the matched event when decimating
+                start_samps = run["match_tick"] + run["epoch_match_tick_delta"]
+                first_samp = -run["epoch_match_tick_delta"][0] % decimate
+                dblock = h5[run["dblock_path"][0]]
+                epoch_dt = mkh5._get_epoch_dtype(
+                    epoch_table.dtype, dblock.dtype, columns
+                )
 
-                # ------------------------------------------------------------
-                # ATTENTION: THIS SECTION IS HIGHLY PROCEDURAL AND BRITTLE
-                # ------------------------------------------------------------
-                # build data types
-                epoch_dt_types = []
-                for n in epoch_dt_names:
-                    if n in epoch_streams.dtype.names:
-                        epoch_dt_types.append(epoch_streams.dtype[n])
-                    elif n in e.dtype.names:
-                        epoch_dt_types.append(event_info.dtype[n])
-                    else:
-                        raise ValueError(
-                            f"column {n} not found in dblock or epoch table"
-                        )
+                # read just the data streams needed, in spans that skip
+                # long gaps between epochs unless the span is filtered
+                stream_names = None
+                if columns is not None:
+                    stream_names = [c for c in dblock.dtype.names if c in columns]
+                max_gap = nsamp if decimate == 1 else None
+                span_ids, span_starts, span_stops = mkh5._get_epoch_spans(
+                    start_samps, nsamp, max_gap
+                )
+                spans = [
+                    mkh5._h5_get_span(dblock, start, stop, decimate, stream_names)
+                    for start, stop in zip(span_starts, span_stops)
+                ]
+
+                for e, start_samp, span_id in zip(run, start_samps, span_ids):
+                    span_start = span_starts[span_id]
+                    span_streams = spans[span_id]
+                    start = start_samp - span_start + first_samp
+                    stop = start_samp - span_start + nsamp
+                    epoch_streams = span_streams[start:stop:decimate]
+                    ticks = np.arange(start_samp + first_samp, start_samp + nsamp)[
+                        ::decimate
+                    ]
+                    epoch = mkh5._make_epoch(e, epoch_streams, ticks, epoch_dt)
+                    yield (epoch)
+
+    def _h5_extract_epochs(self, epochs_name, n_jobs=1, out=None, **kwargs):
+        """extract epochs, in parallel across dblocks if n_jobs > 1
+
+        Parameters
+        ----------
+        epochs_name : str
+           name of a previously set epochs table
+        n_jobs : int
+           number of worker processes, -1 for all CPUs
+        out : numpy.ndarray or None
+           if not None fill and return this 1-D, C-contiguous array
+           instead of allocating a new one
+        **kwargs
+           epochs extraction parameters passed to _h5_get_epochs()
+
+        Returns
+        -------
+        epochs : numpy.ndarray
+           same as get_epochs(format="numpy")
 
-                # # define dtype and initialize
-                epoch_dt = np.dtype(list(zip(epoch_dt_names, epoch_dt_types)))
-                # epoch = np.ndarray(shape=(nsamp,), dtype=np.dtype(epoch_dt))
-                epoch = np.zeros(shape=(nsamp,), dtype=np.dtype(epoch_dt))
-
-                # take the stream names first to protect the time
-                # varying columns, then propagate the new info from
-                # the epoch event.
-                srate = e["dblock_srate"]
-                assert e["match_time"] == 0
-                for n in epoch_dt_names:
-                    # these are already time-varying
-                    if n in epoch_streams.dtype.names:
-                        epoch[n] = epoch_streams[n]
-
-                    # generate match, anchor time stamps and deltas
-                    elif n == "match_time":
-                        epoch[n] = [
-                            int(mkh5._samp2ms(x - e["match_tick"], srate))
-                            for x in range(start_samp, stop_samp)
-                        ]
-                    elif n == "anchor_time":
-                        epoch[n] = [
-                            int(mkh5._samp2ms(x - e["anchor_tick"], srate))
-                            for x in range(start_samp, stop_samp)
-                        ]
 
-                    # broadcast the constants across the times
-                    elif n == "anchor_time_delta":
-                        epoch[n] = int(mkh5._samp2ms(e["anchor_tick_delta"], srate))
+        The parent selects the epochs once and hands each worker the
+        epochs table rows for a run of dblocks. Each worker process
+        opens the mkh5 file read-only, extracts the epochs and hands
+        them back via shared memory. The parent copies them into place
+        in the epochs table (epoch_id) order so the result is the same
+        as extracting serially.
 
-                    # broadcast event info
-                    elif n in event_info.dtype.names:
-                        epoch[n] = event_info[n]
+        """
+        if n_jobs == -1:
+            n_jobs = os.cpu_count()
+
+        if n_jobs == 1 and out is None:
+            return np.array(
+                [e for e in self._h5_get_epochs(epochs_name, **kwargs)]
+            ).flatten()
+
+        if n_jobs == 1:
+            n_samps = 0
+            for epoch in self._h5_get_epochs(epochs_name, **kwargs):
+                mkh5._check_out(out, epoch.dtype, n_samps + len(epoch), exact=False)
+                out[n_samps : n_samps + len(epoch)] = epoch
+                n_samps += len(epoch)
+            if n_samps != len(out):
+                raise ValueError(f"out has {len(out)} samples, epochs have {n_samps}")
+            return out
+
+        with h5py.File(self.h5_fname, "r") as h5:
+            epoch_table = self._h5_select_epochs(
+                h5, epochs_name, where=kwargs.get("where", None)
+            )
+        if len(epoch_table) == 0:
+            if out is not None and len(out) != 0:
+                raise ValueError(f"out has {len(out)} samples, epochs have 0")
+            return np.array([]) if out is None else out
+
+        # group the epochs table rows by dblock once, table order within
+        # each dblock, then one task per run of dblocks
+        dblock_paths, dblock_idxs = np.unique(
+            epoch_table["dblock_path"], return_inverse=True
+        )
+        dblock_rows = np.argsort(dblock_idxs, kind="stable")
+        dblock_starts = np.concatenate(
+            [[0], np.cumsum(np.bincount(dblock_idxs, minlength=len(dblock_paths)))]
+        )
+        n_tasks = min(4 * n_jobs, len(dblock_paths))
+        task_rows = [
+            dblock_rows[dblock_starts[run[0]] : dblock_starts[run[-1] + 1]]
+            for run in np.array_split(np.arange(len(dblock_paths)), n_tasks)
+        ]
+        task_kwargs = dict((k, v) for k, v in kwargs.items() if k != "where")
+        tasks = [
+            (self, epochs_name, epoch_table[rows], task_kwargs) for rows in task_rows
+        ]
+
+        # start the resource tracker before forking so the workers
+        # share it and the parent can unlink their shared memory
+        from multiprocessing import resource_tracker  # Python >= 3.8
+
+        resource_tracker.ensure_running()
+        epochs = None
+        with multiprocessing.Pool(min(n_jobs, n_tasks)) as pool:
+            for rows, descriptor in zip(
+                task_rows, pool.imap(_get_epochs_worker, tasks)
+            ):
+                task_epochs, shm = _from_shared_memory(descriptor)
+                task_epochs = task_epochs.reshape(len(rows), -1)
+                if epochs is None:
+                    shape = (len(epoch_table), task_epochs.shape[1])
+                    if out is None:
+                        epochs = np.empty(shape=shape, dtype=task_epochs.dtype)
                     else:
-                        raise ValueError(
-                            "uh oh ... unknown column {0} in epoch data extraction".format(
-                                n
-                            )
-                        )
+                        mkh5._check_out(out, task_epochs.dtype, np.prod(shape))
+                        epochs = out.reshape(shape)
+                epochs[rows] = task_epochs
+                del task_epochs
+                shm.close()
+                shm.unlink()
+        return epochs.flatten() if out is None else out
 
-                # ------------------------------------------------------------
-                yield (epoch)
+    def _epochs_cache_key(self, h5, epochs_name, **kwargs):
+        """fingerprint an epochs extraction for looking up cached epochs
+
+        Parameters
+        ----------
+        h5 : h5py.File
+           open, readable mkh5 file
+        epochs_name : str
+           name of a previously set epochs table
+        **kwargs
+           epochs extraction parameters as passed to _h5_get_epochs()
+
+        Returns
+        -------
+        key : str
+           sha256 hex digest of the mkpy version, epochs name,
+           extraction parameters, and the JSON headers of the dblocks
+           the epochs come from. The headers carry the dblock uuid
+           and calibration state so the key changes if the data do.
+
+        """
+        epochs_table = mkh5._h5_read_epochs_table(h5, epochs_name)
+        fingerprint = [__version__, epochs_name, sorted(kwargs.items())]
+        for dbp in np.unique(epochs_table["dblock_path"]):
+            dbp = dbp.decode("utf8")
+            json_header = h5[dbp].attrs["json_header"]
+            fingerprint.append(
+                (dbp, hashlib.md5(json_header.encode("utf8")).hexdigest())
+            )
+        return hashlib.sha256(json.dumps(fingerprint).encode("utf8")).hexdigest()
+
+    def _h5_get_cached_epochs(
+        self, epochs_name, mmap=False, n_jobs=1, out=None, **kwargs
+    ):
+        """fetch epochs from the mkh5 cache, extracting and caching them if needed
+
+        Parameters
+        ----------
+        epochs_name : str
+           name of a previously set epochs table
+        mmap : bool
+           if True return a read-only numpy.memmap of the cached
+           dataset in the mkh5 file instead of reading it into memory
+        n_jobs : int
+           number of worker processes for extracting uncached epochs
+        out : numpy.ndarray or None
+           if not None, read the epochs into this array, see
+           _h5_extract_epochs()
+        **kwargs
+           epochs extraction parameters passed to _h5_get_epochs()
+
+        Returns
+        -------
+        epochs : numpy.ndarray or numpy.memmap
+           same as get_epochs(format="numpy")
+
+
+        Cached epochs are stored in the mkh5 file under
+        CACHE_PATH/epochs. If the mkh5 file is not writeable, the
+        epochs are extracted as usual with a warning.
+
+        Memory mapping requires contiguous, uncompressed HDF5 storage
+        which is how the cache is written, if not the cached dataset
+        is read into memory.
+
+        """
+        with h5py.File(self.h5_fname, "r") as h5:
+            cache_key = self._epochs_cache_key(h5, epochs_name, **kwargs)
+            cache_path = f"{mkh5.CACHE_PATH}/epochs/{cache_key}"
+            is_cached = cache_path in h5
+
+        if not is_cached:
+            epochs = self._h5_extract_epochs(
+                epochs_name, n_jobs=n_jobs, out=out, **kwargs
+            )
+            try:
+                with h5py.File(self.h5_fname, "r+") as h5:
+                    cached = h5.create_dataset(cache_path, data=epochs)
+                    cached.attrs["epochs_name"] = epochs_name
+                    for k, v in kwargs.items():
+                        cached.attrs[k] = json.dumps(v)
+            except OSError as fail:
+                msg = f"epochs {epochs_name} not cached in {self.h5_fname}: {fail}"
+                warnings.warn(msg)
+                return epochs
+            if not mmap:
+                return epochs
+
+        with h5py.File(self.h5_fname, "r") as h5:
+            cached = h5[cache_path]
+            offset = cached.id.get_offset()
+            if out is not None:
+                mkh5._check_out(out, cached.dtype, cached.size)
+                cached.read_direct(out)
+                return out
+            if not mmap or cached.chunks is not None or offset is None:
+                return cached[...]
+            dtype, shape = cached.dtype, cached.shape
+        return np.memmap(
+            self.h5_fname, mode="r", dtype=dtype, shape=shape, offset=offset
+        )
+
+    def clear_cache(self, name=None):
+        """delete cached results from the mkh5 file
+
+        Parameters
+        ----------
+        name : str {None, "epochs", "event_table"}
+           delete only this kind of cached result, default None deletes all
+
+        Note
+        ----
+        As with delete_mkdata() hdf5 does not reclaim the space.
+
+        """
+        cache_names = [None, "epochs", "event_table"]
+        if name not in cache_names:
+            raise ValueError(f"name must be one of {cache_names}")
+
+        cache_path = mkh5.CACHE_PATH if name is None else f"{mkh5.CACHE_PATH}/{name}"
+        with h5py.File(self.h5_fname, "r+") as h5:
+            if cache_path in h5:
+                del h5[cache_path]
 
-    def get_epochs(self, epochs_name, format="numpy", columns=None):
+    def get_epochs(
+        self,
+        epochs_name,
+        format="numpy",
+        columns=None,
+        cache=False,
+        decimate=1,
+        where=None,
+        n_jobs=1,
+        shared=False,
+        out=None,
+    ):
         """fetch single trial epochs in tabluar form
 
         Parameters
@@ -1948,6 +2932,41 @@ class mkh5:
         format : str {'numpy', 'pandas'}
         columns : list of str or None {'None'}
             the subset of column names to extract
+        cache : bool or str {False, True, 'mmap'}
+            If True look up the epochs in the mkh5 file cache,
+            extracting and caching them on the first call. 'mmap'
+            does the same and returns the numpy format epochs as a
+            read-only memory map of the cached dataset. Default False
+            extracts the epochs without caching. See Note.
+        decimate : int {1}
+            If > 1, low-pass filter the EEG and keep every
+            `decimate`-th sample counting from the time-locking
+            event, e.g., decimate=2 for 125 Hz epochs from 250 Hz
+            data. See `_h5_get_epochs()` for details.
+        where : str or None {'None'}
+            pandas.DataFrame.query() expression evaluated on the
+            epochs table, e.g., "bin == 3 and log_flags == 0". Only
+            the epochs that pass are extracted, default all. Note
+            the query sees the epochs table values at the time-locking
+            event, not the time-varying data streams.
+        n_jobs : int {1}
+            Number of worker processes to extract the epochs in
+            parallel, in runs of dblocks, -1 uses all CPUs. The
+            epochs are returned in the same order regardless.
+        shared : bool {False}
+            If True, the numpy format epochs are returned in a
+            multiprocessing.shared_memory block and
+            `attrs["shared_memory"]` is a small descriptor other
+            processes use to attach to them without copying, see
+            `attach_shared_epochs()`. Release the block with
+            `release_shared_epochs()` when done. Requires Python 3.8
+            or later.
+        out : numpy.ndarray or None {'None'}
+            Preallocated 1-D, C-contiguous numpy structured array
+            to fill in place with the numpy format epochs and return,
+            e.g., from a previous call, instead of allocating a new
+            array each time. The dtype and length must match the
+            epochs exactly.
 
         Returns
         -------
@@ -1961,7 +2980,36 @@ class mkh5:
           See `_h5_get_epochs()` for details.
 
         attrs : dict
-           stub
+           stub, the epochs table attrs plus `decimate` if > 1
+
+
+        Note
+        ----
+
+        Cached epochs are keyed by the epochs table name, the column
+        selection, and the headers of the dblocks the epochs come
+        from, so re-calibrating or otherwise updating the dblock
+        headers extracts and caches the epochs afresh. Epochs tables
+        are write-protected so they cannot change under the cache.
+        Use `clear_cache()` to discard cached epochs.
+
+        Shared memory epochs are for fanning out one copy of the
+        epochs to worker processes, e.g., for permutation tests or
+        cross-validation.
+
+        .. code-block:: python
+
+           epochs, attrs = myh5.get_epochs("p3", shared=True)
+           descriptor = attrs["shared_memory"]  # pass this to the workers
+
+           # in a worker process
+           epochs, shm = mkh5.attach_shared_epochs(descriptor)
+           ...
+           del epochs
+           shm.close()
+
+           # in the parent when the workers are done
+           mkh5.release_shared_epochs(descriptor)
 
         """
 
@@ -1969,35 +3017,202 @@ class mkh5:
             msg = f"format='numpy' or format='pandas' not {format}"
             raise ValueError(msg)
 
-        epochs = np.array(
-            [e for e in self._h5_get_epochs(epochs_name, columns=columns)]
-        ).flatten()
+        if shared and format != "numpy":
+            raise ValueError("shared=True requires format='numpy'")
+        if shared:
+            _import_shared_memory()  # fail before extracting the epochs
+
+        if out is not None:
+            if format != "numpy" or shared or cache == "mmap":
+                msg = "out requires format='numpy' and not shared or mmap cache"
+                raise ValueError(msg)
+            if not (
+                isinstance(out, np.ndarray)
+                and out.ndim == 1
+                and out.flags.c_contiguous
+                and out.flags.writeable
+            ):
+                raise ValueError("out must be a 1-D, C-contiguous, writeable array")
+
+        if cache not in [False, True, "mmap"]:
+            msg = f"cache=False, cache=True, or cache='mmap' not {cache}"
+            raise ValueError(msg)
+
+        if not (isinstance(decimate, (int, np.integer)) and decimate >= 1):
+            msg = f"decimate must be a positive integer not {decimate}"
+            raise ValueError(msg)
+
+        is_n_jobs = isinstance(n_jobs, (int, np.integer))
+        if not (is_n_jobs and (n_jobs >= 1 or n_jobs == -1)):
+            msg = f"n_jobs must be a positive integer or -1 not {n_jobs}"
+            raise ValueError(msg)
+
+        # epochs extraction parameters
+        get_kwargs = dict(columns=columns, decimate=int(decimate), where=where)
+        if cache:
+            epochs = self._h5_get_cached_epochs(
+                epochs_name,
+                mmap=(cache == "mmap"),
+                n_jobs=n_jobs,
+                out=out,
+                **get_kwargs,
+            )
+        else:
+            epochs = self._h5_extract_epochs(
+                epochs_name, n_jobs=n_jobs, out=out, **get_kwargs
+            )
+
+        if format == "numpy":
+            pass
+        elif format == "pandas":
+            epochs = mkh5._epochs_to_pandas(epochs)
+        else:
+            raise Exception("uncaught exception")
+
+        # fetch the attrs for this epoch dataset
+        with h5py.File(self.h5_fname, "r") as h5:
+            attrs = dict()
+            for k, v in h5[mkh5.EPOCH_TABLES_PATH][epochs_name].attrs.items():
+                attrs[k] = v
+        if decimate > 1:
+            attrs["decimate"] = decimate
+
+        if shared:
+            descriptor, shm = _to_shared_memory(epochs)
+            descriptor["attrs"] = dict(attrs)
+            _SHARED_EPOCHS[shm.name] = shm
+            epochs = np.ndarray(epochs.shape, dtype=epochs.dtype, buffer=shm.buf)
+            attrs["shared_memory"] = descriptor
+
+        return epochs, attrs
+
+    def get_epoch(self, epochs_name, epoch_ids, format="numpy", columns=None):
+        """fetch a few single trial epochs by epoch_id, e.g., for browsing
+
+        Parameters
+        ----------
+        epochs_name : str
+            name of previously set epochs table
+        epoch_ids : int or list of int
+            the epoch_id(s) to fetch, the epochs are returned in this order
+        format : str {'numpy', 'pandas'}
+        columns : list of str or None {'None'}
+            the subset of column names to extract
+
+        Returns
+        -------
+        epochs, attrs
+           as returned by get_epochs() for just these epochs
+
+
+        Note
+        ----
+        The epochs table and the dblock data are read in chunks of
+        `mkh5.CHUNK_CACHE_SAMPLES` samples and kept in an in-process
+        least recently used cache of up to `mkh5.CHUNK_CACHE_BYTES`,
+        so fetching the same or nearby epochs again does not read the
+        mkh5 file. The cache is shared by the mkh5 instances in the
+        process and dropped for a file when the file changes on disk.
+
+        """
+
+        if format not in ["numpy", "pandas"]:
+            msg = f"format='numpy' or format='pandas' not {format}"
+            raise ValueError(msg)
+
+        h5_fname = os.path.abspath(self.h5_fname)
+        _CHUNK_CACHE.check(h5_fname)
+        max_bytes = mkh5.CHUNK_CACHE_BYTES
+        chunk_samps = mkh5.CHUNK_CACHE_SAMPLES
+
+        table_key = ("epochs_table", epochs_name)
+        cached_table = _CHUNK_CACHE.get(h5_fname, table_key)
+        if cached_table is None:
+            with h5py.File(self.h5_fname, "r") as h5:
+                epoch_table = self._h5_select_epochs(h5, epochs_name)
+                attrs = dict(h5[mkh5.EPOCH_TABLES_PATH][epochs_name].attrs.items())
+            cached_table = (epoch_table, attrs)
+            _CHUNK_CACHE.put(
+                h5_fname, table_key, cached_table, epoch_table.nbytes, max_bytes
+            )
+        epoch_table, attrs = cached_table
 
-        if format == "numpy":
-            pass
-        elif format == "pandas":
-            epochs = pd.DataFrame(epochs)
+        # epoch_ids are sorted in the epochs table
+        epoch_ids = np.atleast_1d(epoch_ids)
+        is_missing = ~np.isin(epoch_ids, epoch_table["epoch_id"])
+        if any(is_missing):
+            msg = f"epoch_id {epoch_ids[is_missing]} not in epochs table {epochs_name}"
+            raise ValueError(msg)
+        rows = epoch_table[np.searchsorted(epoch_table["epoch_id"], epoch_ids)]
+
+        # the dblock chunks spanned by each epoch
+        nsamp = int(epoch_table["epoch_ticks"][0])
+        start_samps = rows["match_tick"] + rows["epoch_match_tick_delta"]
+        chunk_spans = [
+            range(start // chunk_samps, (start + nsamp - 1) // chunk_samps + 1)
+            for start in start_samps
+        ]
 
-            # cleanup bytestrings
-            for col in epochs.columns:
-                try:
-                    # encode as utf8 or shrug and move on
-                    epochs.loc[:, col] = epochs.loc[:, col].str.decode("utf8")
-                except Exception as fail:
-                    pass
+        # look up the cached chunks and read the rest
+        chunks = dict()
+        for dbp, span in zip(rows["dblock_path"], chunk_spans):
+            for c in span:
+                chunk = _CHUNK_CACHE.get(h5_fname, (dbp, c))
+                if chunk is not None:
+                    chunks[(dbp, c)] = chunk
+        missing = [
+            (dbp, c)
+            for dbp, span in zip(rows["dblock_path"], chunk_spans)
+            for c in span
+            if (dbp, c) not in chunks
+        ]
+        if missing:
+            with h5py.File(self.h5_fname, "r") as h5:
+                for dbp, c in missing:
+                    if (dbp, c) in chunks:
+                        continue
+                    dblock = h5[dbp]
+                    chunk_stop = min((c + 1) * chunk_samps, len(dblock))
+                    chunk = mkh5._h5_get_span(dblock, c * chunk_samps, chunk_stop)
+                    chunks[(dbp, c)] = chunk
+                    _CHUNK_CACHE.put(h5_fname, (dbp, c), chunk, chunk.nbytes, max_bytes)
+
+        epochs = []
+        for e, start, span in zip(rows, start_samps, chunk_spans):
+            dbp = e["dblock_path"]
+            streams = np.concatenate([chunks[(dbp, c)] for c in span])
+            offset = start - span[0] * chunk_samps
+            epoch_dt = mkh5._get_epoch_dtype(epoch_table.dtype, streams.dtype, columns)
+            epochs.append(
+                mkh5._make_epoch(
+                    e,
+                    streams[offset : offset + nsamp],
+                    np.arange(start, start + nsamp),
+                    epoch_dt,
+                )
+            )
+        epochs = np.concatenate(epochs)
 
-        else:
-            raise Exception("uncaught exception")
+        if format == "pandas":
+            epochs = mkh5._epochs_to_pandas(epochs)
+        return epochs, dict(attrs)
 
-        # fetch the attrs for this epoch dataset
-        with h5py.File(self.h5_fname, "r") as h5:
-            attrs = dict()
-            for k, v in h5[mkh5.EPOCH_TABLES_PATH][epochs_name].attrs.items():
-                attrs[k] = v
+    def _epochs_to_pandas(epochs):
+        """return epochs as a pandas.DataFrame with the bytestrings decoded"""
+        epochs = pd.DataFrame(epochs)
 
-        return epochs, attrs
+        # cleanup bytestrings
+        for col in epochs.columns:
+            try:
+                # encode as utf8 or shrug and move on
+                epochs.loc[:, col] = epochs.loc[:, col].str.decode("utf8")
+            except Exception as fail:
+                pass
+        return epochs
 
-    def export_epochs(self, epochs_name, epochs_f, file_format="h5", columns=None):
+    def export_epochs(
+        self, epochs_name, epochs_f, file_format="h5", columns=None, decimate=1
+    ):
         """write previously set epochs to data in the specified file format
 
         Recommended epoch export formats for cross-platform data interchange
@@ -2009,6 +3224,10 @@ class mkh5:
         epochs_f : string
              file path and name of the data file
         file_format : string, {'h5', 'pdh5', 'feather', 'txt'}
+        columns : list of str or None {'None'}
+             the subset of column names to export, see get_epochs()
+        decimate : int {1}
+             decimate the epochs by this factor, see get_epochs()
 
 
         .. warning ::
@@ -2055,7 +3274,7 @@ class mkh5:
 
         if file_format == "h5":
             (epochs, attrs) = self.get_epochs(
-                epochs_name, format="numpy", columns=columns
+                epochs_name, format="numpy", columns=columns, decimate=decimate
             )
             with h5py.File(epochs_f, "w") as h5:
                 epochs_dataset = h5.create_dataset(epochs_name, data=epochs)
@@ -2064,7 +3283,7 @@ class mkh5:
         else:
             # non-hdf5 formats
             (epochs, attrs) = self.get_epochs(
-                epochs_name, format="pandas", columns=columns
+                epochs_name, format="pandas", columns=columns, decimate=decimate
             )
 
             # dump with pandas
@@ -2081,6 +3300,365 @@ class mkh5:
 
         return None
 
+    def average(
+        self, epochs_name, by=["bin"], exclude=["pygarv", "log_flags"], avg_f=None
+    ):
+        """average the EEG epochs by groups without extracting single trials
+
+        Parameters
+        ----------
+        epochs_name : str
+            name of previously set epochs table
+        by : list of str
+            epochs table columns to group the epochs by, e.g., bin
+        exclude : list of str or None
+            dblock data streams, epochs with any non-zero value in
+            any of these streams in the epoch interval are left out
+            of the average. None includes all epochs.
+        avg_f : str or None
+            if not None write the averages to this file in ERPSS
+            .avg format, one record per group via mkio.write_erp_as_avg()
+
+        Returns
+        -------
+        erps : dict
+           "groups" : pandas.DataFrame, one row per group in sorted
+           order with the `by` columns, `n_epochs` averaged, and
+           `n_excluded`
+
+           "mean", "var" : numpy.ndarray, shape (groups, samples, channels)
+           the average and sample variance (ddof=1) of the EEG
+
+           "times" : numpy.ndarray, the epoch times in milliseconds
+
+           "channels" : list of str, the EEG channel names
+
+
+        Note
+        ----
+
+        Epochs are read dblock by dblock, each run of epochs in the
+        same dblock as one span of samples, and accumulated in
+        float64 running means and Welford sums of squares per group.
+        The exclusion test is a prefix sum over the span, so epochs
+        are never stacked into a single trials array. The EEG
+        channels are the float data streams of the dblocks. Epochs
+        with NaN in any `by` column belong to no group.
+
+        The .avg format holds at most 32 channels and 3 * 256
+        samples per record, see mkio.write_erp_as_avg()
+
+        """
+
+        exclude = [] if exclude is None else list(exclude)
+
+        eptbl = self.get_epochs_table(epochs_name)
+        for col in by:
+            if col not in eptbl.columns:
+                msg = f"by column {col} is not in epochs table {epochs_name}"
+                raise ValueError(msg)
+        grouped = eptbl.groupby(by, sort=True)
+        group_ids = grouped.ngroup().to_numpy()
+        groups = grouped.size().reset_index(name="n_epochs")
+
+        with h5py.File(self.h5_fname, "r") as h5:
+            epoch_table = self._h5_select_epochs(h5, epochs_name)
+            if len(epoch_table) == 0:
+                raise ValueError(f"no epochs in {epochs_name}")
+
+            dblock_dtype, channels = mkh5._h5_get_eeg_channels(h5, epoch_table)
+            for name in exclude:
+                if name not in dblock_dtype.names:
+                    raise ValueError(f"exclude stream {name} is not in the dblocks")
+
+            nsamp = int(epoch_table["epoch_ticks"][0])
+            delta = int(epoch_table["epoch_match_tick_delta"][0])
+            srate = epoch_table["dblock_srate"][0]
+            times = mkh5._samp2ms(np.arange(delta, delta + nsamp), srate)
+
+            n_epochs = np.zeros(len(groups), dtype="int64")
+            n_excluded = np.zeros(len(groups), dtype="int64")
+            means = np.zeros((len(groups), nsamp, len(channels)))
+            m2s = np.zeros((len(groups), nsamp, len(channels)))
+
+            for run_idxs in mkh5._get_epoch_runs(epoch_table):
+                run = epoch_table[run_idxs]
+                start_samps = run["match_tick"] + run["epoch_match_tick_delta"]
+                span_start = start_samps.min()
+                span_stop = start_samps.max() + nsamp
+                span = mkh5._h5_get_span(
+                    h5[run["dblock_path"][0]],
+                    span_start,
+                    span_stop,
+                    names=channels + [c for c in exclude if c not in channels],
+                )
+                eeg = np.stack([span[c] for c in channels], axis=1).astype("float64")
+
+                # count the excluded samples in each epoch interval
+                is_bad = np.zeros(len(span), dtype=bool)
+                for name in exclude:
+                    is_bad |= span[name] != 0
+                n_bad = np.concatenate([[0], np.cumsum(is_bad)])
+                starts = start_samps - span_start
+                is_excluded = (n_bad[starts + nsamp] - n_bad[starts]) > 0
+
+                for idx, start, excluded in zip(run_idxs, starts, is_excluded):
+                    group = group_ids[idx]
+                    if group < 0:
+                        continue
+                    if excluded:
+                        n_excluded[group] += 1
+                        continue
+
+                    # Welford's running mean and sum of squared deviations
+                    epoch = eeg[start : start + nsamp]
+                    n_epochs[group] += 1
+                    diff = epoch - means[group]
+                    means[group] += diff / n_epochs[group]
+                    m2s[group] += diff * (epoch - means[group])
+
+        groups["n_epochs"] = n_epochs
+        groups["n_excluded"] = n_excluded
+        for group in np.flatnonzero(n_epochs == 0):
+            means[group] = np.nan
+        with np.errstate(divide="ignore", invalid="ignore"):
+            variances = m2s / (n_epochs - 1)[:, np.newaxis, np.newaxis]
+        variances[n_epochs < 2] = np.nan
+
+        erps = {
+            "groups": groups,
+            "mean": means,
+            "var": variances,
+            "times": times,
+            "channels": channels,
+        }
+
+        if avg_f is not None:
+            with open(avg_f, "wb") as stream:
+                for group, group_info in groups.iterrows():
+                    if n_epochs[group] == 0:
+                        warnings.warn(f"no epochs to average for {dict(group_info)}")
+                        continue
+                    erp = types.SimpleNamespace(
+                        data=means[group],
+                        times=times,
+                        channel_names=channels,
+                        metadata={
+                            "num_combined_trials": n_epochs[group],
+                            "experiment": epochs_name,
+                        },
+                        name=", ".join(f"{col}={group_info[col]}" for col in by),
+                    )
+                    mkio.write_erp_as_avg(erp, stream)
+
+        return erps
+
+    def measure(self, epochs_name, windows, peak="max"):
+        """mean and peak amplitude measures in time windows for each epoch and channel
+
+        Parameters
+        ----------
+        epochs_name : str
+            name of previously set epochs table
+        windows : dict
+            window name: (tmin_ms, tmax_ms) for each measurement
+            window, inclusive, relative to the time-locking event,
+            e.g., {"N400": (300, 500)}. Windows must be inside the
+            epochs interval.
+        peak : str or dict {"max", "min"}
+            measure the maximum or minimum amplitude for the peak, for
+            all windows or by window name, e.g., {"P3": "max",
+            "N400": "min"}
+
+        Returns
+        -------
+        measures : pandas.DataFrame
+           one row per epoch x window x channel in that order with
+           columns epoch_id, window, channel, mean, peak, and
+           peak_latency in milliseconds. Merge with the epochs
+           table on epoch_id for the experimental variables.
+
+
+        Note
+        ----
+        Only the samples inside the windows are read from the
+        dblocks, a run of epochs in the same dblock at a time. The
+        EEG channels are the float data streams of the dblocks. Ties
+        for the peak go to the earliest sample.
+
+        """
+
+        peaks = peak if isinstance(peak, dict) else {name: peak for name in windows}
+        for name in windows:
+            if peaks.get(name, None) not in ["max", "min"]:
+                raise ValueError(f"peak for window {name} must be 'max' or 'min'")
+
+        with h5py.File(self.h5_fname, "r") as h5:
+            epoch_table = self._h5_select_epochs(h5, epochs_name)
+            _, channels = mkh5._h5_get_eeg_channels(h5, epoch_table)
+
+            # window sample offsets relative to the time-locking event
+            nsamp = int(epoch_table["epoch_ticks"][0])
+            delta = int(epoch_table["epoch_match_tick_delta"][0])
+            srate = epoch_table["dblock_srate"][0]
+            offsets = np.arange(delta, delta + nsamp)
+            times = mkh5._samp2ms(offsets, srate)
+            window_offsets = dict()
+            for name, (tmin_ms, tmax_ms) in windows.items():
+                if not times[0] <= tmin_ms <= tmax_ms <= times[-1]:
+                    msg = (
+                        f"window {name} ({tmin_ms}, {tmax_ms}) is not in the "
+                        f"{epochs_name} interval ({times[0]}, {times[-1]})"
+                    )
+                    raise ValueError(msg)
+                in_window = (times >= tmin_ms) & (times <= tmax_ms)
+                if not in_window.any():
+                    msg = (
+                        f"window {name} ({tmin_ms}, {tmax_ms}) has no samples "
+                        f"at {srate} samples per second, widen the window"
+                    )
+                    raise ValueError(msg)
+                window_offsets[name] = offsets[in_window]
+
+            shape = (len(epoch_table), len(windows), len(channels))
+            means = np.zeros(shape)
+            peak_amps = np.zeros(shape)
+            peak_times = np.zeros(shape, dtype=times.dtype)
+            for run_idxs in mkh5._get_epoch_runs(epoch_table):
+                run = epoch_table[run_idxs]
+
+                # read the unique window samples for all the epochs in the run
+                samps = {
+                    name: run["match_tick"][:, np.newaxis] + offs
+                    for name, offs in window_offsets.items()
+                }
+                read_samps = np.concatenate([s.ravel() for s in samps.values()])
+                read_samps = np.unique(read_samps)
+                data = h5[run["dblock_path"][0]].fields(channels)[read_samps]
+                eeg = np.stack([data[c] for c in channels], axis=-1).astype("float64")
+
+                for w, (name, offs) in enumerate(window_offsets.items()):
+                    # epochs x window samples x channels
+                    window_eeg = eeg[np.searchsorted(read_samps, samps[name])]
+                    means[run_idxs, w] = window_eeg.mean(axis=1)
+                    if peaks[name] == "max":
+                        peak_idxs = window_eeg.argmax(axis=1)
+                    else:
+                        peak_idxs = window_eeg.argmin(axis=1)
+                    peak_amps[run_idxs, w] = np.take_along_axis(
+                        window_eeg, peak_idxs[:, np.newaxis, :], axis=1
+                    )[:, 0, :]
+                    peak_times[run_idxs, w] = mkh5._samp2ms(offs[peak_idxs], srate)
+
+        measures = pd.DataFrame(
+            {
+                "epoch_id": np.repeat(epoch_table["epoch_id"], shape[1] * shape[2]),
+                "window": np.tile(np.repeat(list(windows), shape[2]), shape[0]),
+                "channel": np.tile(channels, shape[0] * shape[1]),
+                "mean": means.ravel(),
+                "peak": peak_amps.ravel(),
+                "peak_latency": peak_times.ravel(),
+            }
+        )
+        return measures
+
+    def get_epochs_artifacts(self, epochs_name):
+        """summarize the pygarv artifact tests and log_flags for each epoch
+
+        Parameters
+        ----------
+        epochs_name : str
+            name of previously set epochs table
+
+        Returns
+        -------
+        artifacts : pandas.DataFrame
+           one row per epoch in epochs table order with columns
+
+           `epoch_id`
+           `pygarv` : uint64, bitwise OR of the pygarv stream over the
+              epoch interval
+           `pygarv_any` : bool, True if any pygarv test fired in the
+              epoch interval
+           `pygarv_tests` : list of str, "test stream tag" for each
+              test that fired, from the dblock header['pygarv']['tests']
+           `log_flags` : the log_flags at the match tick
+
+           Merge with the epochs table on epoch_id for the experimental
+           variables.
+
+
+        Note
+        ----
+        No epochs are extracted. The pygarv and log_flags streams of
+        each dblock are read once and each pygarv bit set anywhere in
+        the dblock is counted with a cumulative sum, so the count in an
+        epoch interval is the difference of the sums at the ends.
+
+        """
+
+        hio = self.HeaderIO()
+        with h5py.File(self.h5_fname, "r") as h5:
+            epoch_table = self._h5_select_epochs(h5, epochs_name)
+            nsamp = int(epoch_table["epoch_ticks"][0]) if len(epoch_table) else 0
+            masks = np.zeros(len(epoch_table), dtype=mkh5._pygarv)
+            log_flags = np.zeros(len(epoch_table), dtype=mkh5._log_flag)
+            test_labels = dict()
+            for dbp in np.unique(epoch_table["dblock_path"]):
+                idxs = np.flatnonzero(epoch_table["dblock_path"] == dbp)
+                match_ticks = epoch_table["match_tick"][idxs]
+                starts = match_ticks + epoch_table["epoch_match_tick_delta"][idxs]
+                span_start = starts.min()
+                dblock = h5[dbp]
+                span = dblock.fields(["pygarv", "log_flags"])[
+                    span_start : starts.max() + nsamp
+                ]
+                log_flags[idxs] = span["log_flags"][match_ticks - span_start]
+                starts = starts - span_start
+
+                # per-dblock bit -> test lookup, see pygarv._encode_pygarv_stream
+                hio.get(dblock)
+                tests = hio.header.get("pygarv", dict()).get("tests", [])
+                labels = []
+                for test in tests:
+                    if isinstance(test, list):
+                        test = dict(kv for param in test for kv in param.items())
+                    labels.append(
+                        " ".join(
+                            str(test[k]) for k in ["test", "stream", "tag"] if k in test
+                        )
+                    )
+
+                pygarv_or = int(np.bitwise_or.reduce(span["pygarv"]))
+                for bit in range(pygarv_or.bit_length()):
+                    if not (pygarv_or >> bit) & 1:
+                        continue
+                    is_set = (span["pygarv"] >> np.uint64(bit)) & np.uint64(1)
+                    n_set = np.concatenate([[0], np.cumsum(is_set)])
+                    fired = (n_set[starts + nsamp] - n_set[starts]) > 0
+                    masks[idxs] |= fired.astype(mkh5._pygarv) << np.uint64(bit)
+                    label = labels[bit] if bit < len(labels) else f"bit {bit}"
+                    test_labels[(dbp, bit)] = label
+
+        pygarv_tests = [
+            [
+                test_labels[(dbp, bit)]
+                for bit in range(int(mask).bit_length())
+                if (int(mask) >> bit) & 1
+            ]
+            for dbp, mask in zip(epoch_table["dblock_path"], masks)
+        ]
+        artifacts = pd.DataFrame(
+            {
+                "epoch_id": epoch_table["epoch_id"],
+                "pygarv": masks,
+                "pygarv_any": masks != 0,
+                "pygarv_tests": pygarv_tests,
+                "log_flags": log_flags,
+            }
+        )
+        return artifacts
+
     # ------------------------------------------------------------
     # PRIVATE (-ish) CRUD. These all wrap the hp5py.File()
     # in a context manager so user's don't have to.
@@ -2680,29 +4258,15 @@ class mkh5:
         ]
 
         """
-        re.compile(pattern)
-
-        h5_paths = h5tools.get_data_group_paths(self.h5_fname)
-        db_slashpaths = []
-        for path in h5_paths:
-            db_slashpaths.append(h5tools.get_dblock_paths(self.h5_fname, path))
-
-        matches = []
-        with h5py.File(self.h5_fname, "r") as h5:
-            for db_slashpath in db_slashpaths:
-                for dbs in db_slashpath:
-                    hio = self.HeaderIO()  # abundance of caution we are starting fresh
-                    hio.get(h5[dbs])
-                    hdr_paths = dpath.path.paths(hio.header, dirs=False, leaves=False)
-                    for hdr_path in hdr_paths:
-                        slash_path = "/".join([str(p[0]) for p in hdr_path])
-                        full_path = dbs + "/" + slash_path
-                        m = re.search(pattern, full_path)
-                        if m:
-                            matches.append(
-                                (full_path, dpath.path.get(hio.header, hdr_path))
-                            )
-                    del hio
+        pattern_regx = re.compile(pattern)
+
+        # one pass of the regexp over the flattened headers of all the dblocks
+        slashpaths, values = _HEADER_INDEX.get(self.h5_fname, mkh5.HEADER_INDEX_LEAVES)
+        matches = [
+            (slashpath, value)
+            for slashpath, value in zip(slashpaths, values)
+            if pattern_regx.search(slashpath)
+        ]
         if len(matches) == 0:
             return None
         else:
@@ -2718,9 +4282,11 @@ class mkh5:
         """
         # headinfo = self.headinfo(**kwargs)
         headinfo = self._get_head(".+")
-        h5_paths = np.unique(
-            [re.match(r".*dblock_\d+", x).group() for x in [y[0] for y in headinfo]]
-        )
+        dblock_headinfo = dict()
+        for slashpath, value in headinfo:
+            dbp = re.match(r".*dblock_\d+", slashpath).group()
+            dblock_headinfo.setdefault(dbp, []).append((slashpath, value))
+        h5_paths = np.unique(list(dblock_headinfo.keys()))
 
         info = ""
         with h5py.File(self.h5_fname, "r") as h5:
@@ -2730,7 +4296,7 @@ class mkh5:
                 info += "------------------------------------------------------------\n"
                 if isinstance(h5[n], h5py.Dataset):
                     info += "datablock attributes:\n"
-                    hdr_slash_vals = self._get_head(n)
+                    hdr_slash_vals = dblock_headinfo[n]
                     db_headinfo = "\n".join(
                         ["{0}: {1}".format(k, v) for k, v in hdr_slash_vals]
                     )
@@ -3142,6 +4708,235 @@ class mkh5:
         ms = np.float32(samp * period)
         return ms
 
+    def _h5_get_eeg_channels(h5, epoch_table):
+        """return the dblock dtype and the EEG channel names for the epochs
+
+        The EEG channels are the float data streams and must be the
+        same in all the dblocks the epochs come from.
+        """
+        dblock_paths = np.unique(epoch_table["dblock_path"])
+        dblock_dtypes = set([h5[dbp].dtype for dbp in dblock_paths])
+        if len(dblock_dtypes) != 1:
+            msg = "the dblock data types differ or there are no epochs"
+            raise ValueError(msg)
+        dblock_dtype = dblock_dtypes.pop()
+        channels = [c for c in dblock_dtype.names if dblock_dtype[c].kind == "f"]
+        return dblock_dtype, channels
+
+    def _get_epoch_runs(epoch_table):
+        """split epochs table row indices into runs of epochs from the same dblock"""
+        epoch_dblocks = epoch_table["dblock_path"]
+        run_starts = np.flatnonzero(epoch_dblocks[1:] != epoch_dblocks[:-1]) + 1
+        return np.split(np.arange(len(epoch_table)), run_starts)
+
+    def _get_epoch_spans(start_samps, nsamp, max_gap=None):
+        """group the epochs in a dblock into spans of samples to read at once
+
+        Parameters
+        ----------
+        start_samps : numpy.ndarray of int
+           epoch start samples in one dblock, in any order
+        nsamp : int
+           epoch length in samples
+        max_gap : int or None
+           start a new span where more than max_gap samples separate
+           the epochs, default None reads all the epochs in one span
+
+        Returns
+        -------
+        span_ids : numpy.ndarray of int
+           index of the span for each epoch in start_samps order
+        span_starts, span_stops : numpy.ndarray of int
+           the dblock sample slice for each span
+        """
+        order = np.argsort(start_samps, kind="stable")
+        starts = start_samps[order]
+        stops = np.maximum.accumulate(starts + nsamp)
+        is_first = np.zeros(len(starts), dtype=bool)
+        is_first[0] = True
+        if max_gap is not None:
+            is_first[1:] = starts[1:] - stops[:-1] > max_gap
+        span_firsts = np.flatnonzero(is_first)
+        span_lasts = np.append(span_firsts[1:], len(starts)) - 1
+        span_ids = np.empty(len(starts), dtype=int)
+        span_ids[order] = np.cumsum(is_first) - 1
+        return span_ids, starts[span_firsts], stops[span_lasts]
+
+    def _decimation_fir(decimate):
+        """low-pass FIR filter coefficients for decimating by an integer factor
+
+        Hamming windowed sinc, 20 * decimate + 1 taps, cutoff at the
+        Nyquist frequency of the decimated data, unity gain at DC.
+        This is the same design as the scipy.signal.decimate default
+        FIR. The filter is symmetric so convolving with "valid" or
+        "same" has no phase shift.
+        """
+        n_taps = 20 * decimate + 1
+        times = np.arange(n_taps) - (n_taps - 1) / 2
+        taps = np.sinc(times / decimate) * np.hamming(n_taps)
+        return taps / taps.sum()
+
+    def _get_epoch_dtype(epoch_table_dtype, dblock_dtype, columns=None):
+        """merge the epochs table and dblock data stream columns for extraction
+
+        Parameters
+        ----------
+        epoch_table_dtype : numpy.dtype
+           of the epochs table
+        dblock_dtype : numpy.dtype
+           of the dblock, float16 EEG streams are upcast to float32 as
+           in _h5_get_span()
+        columns : list of str or None
+           column names to extract, default None extracts all
+
+        Returns
+        -------
+        epoch_dt : numpy.dtype
+           epochs table columns then the dblock data streams, or the
+           columns in the order given
+
+        """
+
+        # merge epoch table, match_time, and datablock stream table column names
+        all_cols = list(epoch_table_dtype.names)
+        for c in dblock_dtype.names:
+            if c not in all_cols:
+                all_cols.append(c)
+
+        # use all available columns (default) or specified subset
+        if columns is None:
+            epoch_dt_names = all_cols
+        else:
+            for c in columns:
+                if not c in all_cols:
+                    msg = "column {0} not found in epoch table or data block: ".format(
+                        c
+                    )
+                    msg += " ".join(all_cols)
+                    raise RuntimeError(msg)
+            epoch_dt_names = columns
+
+        # data streams take precedence, see _make_epoch()
+        epoch_dt_types = []
+        for n in epoch_dt_names:
+            if n in dblock_dtype.names:
+                if dblock_dtype[n] == "float16":
+                    epoch_dt_types.append(np.dtype("float32"))
+                else:
+                    epoch_dt_types.append(dblock_dtype[n])
+            else:
+                epoch_dt_types.append(epoch_table_dtype[n])
+        return np.dtype(list(zip(epoch_dt_names, epoch_dt_types)))
+
+    def _make_epoch(e, epoch_streams, ticks, epoch_dt):
+        """broadcast an epochs table row across the epoch data streams
+
+        Parameters
+        ----------
+        e : numpy.void
+           epochs table row
+        epoch_streams : numpy structured array
+           the dblock data streams at the epoch `ticks`
+        ticks : numpy.ndarray
+           dblock sample indexes of the epoch
+        epoch_dt : numpy.dtype
+           from _get_epoch_dtype()
+
+        Returns
+        -------
+        epoch : numpy structured array, shape (len(ticks), ), dtype epoch_dt
+
+        """
+
+        epoch = np.zeros(shape=(len(ticks),), dtype=epoch_dt)
+
+        # take the stream names first to protect the time
+        # varying columns, then propagate the new info from
+        # the epoch event.
+        srate = e["dblock_srate"]
+        assert e["match_time"] == 0
+        for n in epoch_dt.names:
+            # these are already time-varying
+            if n in epoch_streams.dtype.names:
+                epoch[n] = epoch_streams[n]
+
+            # generate match, anchor time stamps and deltas
+            elif n == "match_time":
+                epoch[n] = mkh5._samp2ms(ticks - e["match_tick"], srate)
+            elif n == "anchor_time":
+                epoch[n] = mkh5._samp2ms(ticks - e["anchor_tick"], srate)
+
+            # broadcast the constants across the times
+            elif n == "anchor_time_delta":
+                epoch[n] = int(mkh5._samp2ms(e["anchor_tick_delta"], srate))
+
+            # broadcast event info
+            elif n in e.dtype.names:
+                epoch[n] = e[n]
+            else:
+                raise ValueError(
+                    "uh oh ... unknown column {0} in epoch data extraction".format(n)
+                )
+        return epoch
+
+    def _h5_get_span(dblock, start, stop, decimate=1, names=None):
+        """read dblock[start:stop] with float16 EEG upcast to float32
+
+        Parameters
+        ----------
+        dblock : h5py.Dataset
+           mkh5 datablock
+        start, stop : int
+           slice of dblock samples to read
+        decimate : int
+           if > 1, the float EEG streams are low-pass filtered with
+           mkh5._decimation_fir(decimate)
+        names : list of str or None
+           read only these data streams, default None reads all
+
+        Returns
+        -------
+        span : numpy structured array
+           shape (stop - start, )
+
+        """
+
+        pad = 0
+        if decimate > 1:
+            taps = mkh5._decimation_fir(decimate)
+            pad = (len(taps) - 1) // 2
+        read_start = max(start - pad, 0)
+        read_stop = min(stop + pad, len(dblock))
+        if names is None:
+            streams = dblock[read_start:read_stop]
+        elif len(names) == 0:
+            return np.zeros(shape=(stop - start,), dtype=np.dtype([]))
+        else:
+            streams = dblock.fields(names)[read_start:read_stop]
+
+        # upconvert EEG columns float16 to float32 b.c. 2 byte floats
+        # fight w/ feather (unsupported datatype), MATLAB
+        # (cannot co-mingle w/ int64)
+        f4_streams_dtype = []
+        for name in streams.dtype.names:
+            if streams.dtype[name] == "float16":
+                f4_streams_dtype.append((name, "float32"))
+            else:
+                f4_streams_dtype.append((name, streams.dtype[name]))
+        f4_streams_dtype = np.dtype(f4_streams_dtype)
+
+        span = np.array(
+            streams[start - read_start : stop - read_start], dtype=f4_streams_dtype
+        )
+        if decimate > 1:
+            # pad out to the full filter length at the dblock edges
+            edge_pads = (pad - (start - read_start), pad - (read_stop - stop))
+            for name in streams.dtype.names:
+                if streams.dtype[name].kind == "f":
+                    padded = np.pad(streams[name].astype("float64"), edge_pads, "edge")
+                    span[name] = np.convolve(padded, taps, mode="valid")
+        return span
+
     def _get_dblock_slices_at(
         anchors, n_before, n_duration, min_samp=None, max_samp=None
     ):
@@ -3523,7 +5318,14 @@ class mkh5:
         # jsonification occurs in dblock CRUD
         return (attr, data)
 
-    def _h5_get_slices_from_datablock(dblock, slicer):
+    def _check_out(out, dtype, size, exact=True):
+        """raise ValueError if out cannot hold size items of dtype"""
+        if out.dtype != dtype:
+            raise ValueError(f"out dtype {out.dtype} does not match {dtype}")
+        if (exact and out.size != size) or out.size < size:
+            raise ValueError(f"out has {out.size} items not {size}")
+
+    def _h5_get_slices_from_datablock(dblock, slicer, out=None):
         """minimal mkh5 datablock epochs slicer
 
         Parameters
@@ -3533,21 +5335,35 @@ class mkh5:
             an open, readable mkh5 datablock, dblock_N
         slicer : numpy.ndarray, dtype=dtype _evticks
             i.e., tuples (start_samps, anchor_samps, stop_samps)
+        out : numpy.ndarray or None
+            preallocated array to fill in place, shape (n_samps, n_slices)
+            and dtype dblock.dtype
 
         Returns
         -------
-            a copy of the data
+            a copy of the data, out if given
 
         """
-        epochs_data = []
-        for e in slicer:
-            # dblocks are sample rows down x data columns across
-            # slicing here is a *row* slice, exactly what we want
-            epochs_data.append(dblock[e["start_samps"] : e["stop_samps"]])
-
-            # stack the arrays so access by name, e.g., MiPa returns a
-            # subarray with sample rows down x epoch columns accross
-        return np.stack(epochs_data, axis=1)
+        n_samps = np.unique(slicer["stop_samps"] - slicer["start_samps"])
+        if len(n_samps) != 1:
+            raise ValueError("slices must all be the same length")
+
+        # stack the slices so access by name, e.g., MiPa returns a
+        # subarray with sample rows down x epoch columns accross
+        shape = (int(n_samps[0]), len(slicer))
+        if out is None:
+            out = np.empty(shape=shape, dtype=dblock.dtype)
+        elif out.shape != shape:
+            raise ValueError(f"out shape {out.shape} does not match {shape}")
+        mkh5._check_out(out, dblock.dtype, np.prod(shape))
+
+        # dblocks are sample rows down x data columns across
+        # slicing here is a *row* slice, exactly what we want
+        epoch_data = np.empty(shape=shape[:1], dtype=dblock.dtype)
+        for i, e in enumerate(slicer):
+            dblock.read_direct(epoch_data, np.s_[e["start_samps"] : e["stop_samps"]])
+            out[:, i] = epoch_data
+        return out
 
     def _h5_get_calinfo(
         self,
@@ -3960,6 +5776,331 @@ class mkh5:
 
 
 # TPU
+def _import_shared_memory():
+    """return the multiprocessing.shared_memory module
+
+    Raises
+    ------
+    RuntimeError
+       if this Python does not have it (< 3.8)
+    """
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        msg = (
+            "shared memory epochs require Python 3.8 or later, "
+            f"not {platform.python_version()}"
+        )
+        raise RuntimeError(msg)
+    return shared_memory
+
+
+def _to_shared_memory(arr):
+    """copy a numpy array into a new shared memory block
+
+    Parameters
+    ----------
+    arr : numpy.ndarray
+
+    Returns
+    -------
+    descriptor : dict
+       name, shape, dtype of the shared memory array, for
+       _from_shared_memory()
+    shm : multiprocessing.shared_memory.SharedMemory
+       close() when done, unlink() when no process needs it
+
+    """
+    shared_memory = _import_shared_memory()
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    shm_arr = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+    shm_arr[...] = arr
+    del shm_arr
+    descriptor = {"name": shm.name, "shape": arr.shape, "dtype": arr.dtype}
+    return descriptor, shm
+
+
+def _from_shared_memory(descriptor, track=True):
+    """attach to a shared memory array from _to_shared_memory() without copying
+
+    Parameters
+    ----------
+    descriptor : dict
+       from _to_shared_memory()
+    track : bool
+       if False, and the Python version supports it (>= 3.13), do not
+       register the block with this process's resource tracker
+
+    Returns
+    -------
+    arr : numpy.ndarray
+       backed by the shared memory block, del before shm.close()
+    shm : multiprocessing.shared_memory.SharedMemory
+
+    """
+    shared_memory = _import_shared_memory()
+    try:
+        shm = shared_memory.SharedMemory(name=descriptor["name"], track=track)
+    except TypeError:
+        # Python < 3.13
+        shm = shared_memory.SharedMemory(name=descriptor["name"])
+    arr = np.ndarray(descriptor["shape"], dtype=descriptor["dtype"], buffer=shm.buf)
+    return arr, shm
+
+
+# shared memory epochs blocks created in this process, by name
+_SHARED_EPOCHS = dict()
+
+
+def attach_shared_epochs(descriptor):
+    """attach to epochs from mkh5.get_epochs(..., shared=True) without copying
+
+    Parameters
+    ----------
+    descriptor : dict
+       `attrs["shared_memory"]` returned by get_epochs(), with the
+       shared memory block name, epochs shape and dtype, and the
+       epochs attrs under "attrs"
+
+    Returns
+    -------
+    epochs : numpy.ndarray
+       the epochs, backed by the shared memory block
+    shm : multiprocessing.shared_memory.SharedMemory
+       del epochs and shm.close() when done, the process that
+       called get_epochs() releases the block
+
+
+    Note
+    ----
+    Before Python 3.13, the multiprocessing resource tracker of a
+    process that attaches to shared memory unlinks the block when
+    the process exits. Attach from processes started by the process
+    that called get_epochs(), e.g., via multiprocessing, which share
+    its resource tracker.
+
+    """
+    return _from_shared_memory(descriptor, track=False)
+
+
+def release_shared_epochs(descriptor):
+    """unlink shared memory epochs from mkh5.get_epochs(..., shared=True)
+
+    Call this in the process that called get_epochs() after the
+    other processes are done with the epochs. The memory is freed
+    when the epochs arrays that use it are gone.
+
+    """
+    _import_shared_memory()
+    shm = _SHARED_EPOCHS.pop(descriptor["name"], None)
+    if shm is None:
+        msg = f"no shared memory epochs {descriptor['name']} in this process"
+        raise ValueError(msg)
+    try:
+        shm.close()
+    except BufferError:
+        # epochs arrays still refer to the block, the memory is
+        # freed when they are gone
+        pass
+    shm.unlink()
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_slashpath(slashpath):
+    """split a header slashpath into keys once, see HeaderIO._update_from_slashpaths()
+
+    Returns
+    -------
+    keys : tuple of str
+    is_glob : bool
+       True if a key has dpath glob characters or is empty
+    """
+    keys = tuple(slashpath.lstrip("/").split("/"))
+    is_glob = any(key == "" or dpath.path.is_glob(key) for key in keys)
+    return keys, is_glob
+
+
+def _get_epochs_worker(task):
+    """extract epochs for some dblocks in a worker process, see _h5_extract_epochs()
+
+    Parameters
+    ----------
+    task : tuple
+       (mkh5 instance, epochs_name, epochs table rows, _h5_get_epochs() kwargs)
+
+    Returns
+    -------
+    descriptor : dict
+       the extracted epochs in shared memory, the parent unlinks it
+
+    """
+    myh5, epochs_name, epoch_table, kwargs = task
+    epochs = np.array(
+        [e for e in myh5._h5_get_epochs(epochs_name, epoch_table=epoch_table, **kwargs)]
+    ).flatten()
+    descriptor, shm = _to_shared_memory(epochs)
+    shm.close()
+    return descriptor
+
+
+def _get_event_table_worker(task):
+    """sweep the code map across some dblocks in a worker process, see get_event_table()
+
+    Parameters
+    ----------
+    task : tuple
+       (mkh5 instance, CodeTagger, header_map_f, [(data group path, dblock path), ...])
+
+    Returns
+    -------
+    dblocks_events : list
+       (dblock path, event table rows) for each dblock, in order
+
+    """
+    myh5, ctagger, header_map_f, dblock_paths = task
+    return list(myh5._get_dblocks_events(ctagger, header_map_f, dblock_paths))
+
+
+class _DblockChunkCache:
+    """in-process LRU cache of decoded dblock chunks, see mkh5.get_epoch()
+
+    Entries are keyed by mkh5 file and dropped for the file when its
+    size or modification time changes.
+
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._stamps = dict()
+        self.nbytes = 0
+
+    def check(self, h5_fname):
+        """drop the h5_fname entries if the file changed since they were cached"""
+        stat = os.stat(h5_fname)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if self._stamps.get(h5_fname, None) != stamp:
+            self.clear(h5_fname)
+            self._stamps[h5_fname] = stamp
+
+    def get(self, h5_fname, key):
+        """return the cached value or None, and mark it most recently used"""
+        entry = self._entries.get((h5_fname, key), None)
+        if entry is None:
+            return None
+        self._entries.move_to_end((h5_fname, key))
+        return entry[0]
+
+    def put(self, h5_fname, key, value, nbytes, max_bytes):
+        """cache the value, evicting least recently used entries over max_bytes"""
+        if nbytes > max_bytes:
+            return
+        replaced = self._entries.pop((h5_fname, key), None)
+        if replaced is not None:
+            self.nbytes -= replaced[1]
+        self._entries[(h5_fname, key)] = (value, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.nbytes -= evicted
+
+    def clear(self, h5_fname=None):
+        """drop the entries for h5_fname, default None drops all"""
+        for entry_key in list(self._entries.keys()):
+            if h5_fname is None or entry_key[0] == h5_fname:
+                _, nbytes = self._entries.pop(entry_key)
+                self.nbytes -= nbytes
+        if h5_fname is None:
+            self._stamps.clear()
+        else:
+            self._stamps.pop(h5_fname, None)
+
+
+_CHUNK_CACHE = _DblockChunkCache()
+
+
+class _HeaderIndex:
+    """in-process flattened index of mkh5 dblock headers, see mkh5._get_head()
+
+    The index holds the dblock_path/header/slashpath and value of
+    every header leaf in the mkh5 file. The dblock JSON headers are
+    checked on each lookup and only new or changed dblock headers are
+    flattened again. Least recently used files are dropped when the
+    indexes hold more than max_leaves header leaves.
+
+    """
+
+    def __init__(self):
+        self._dblocks = dict()  # (h5_fname, dbp): (header md5, slashpaths, values)
+        self._indexes = OrderedDict()  # h5_fname: (fingerprint, slashpaths, values)
+        self.n_leaves = 0
+
+    def get(self, h5_fname, max_leaves):
+        """return the header slashpaths and values as lists, in dblock order"""
+        h5_fname = os.path.abspath(h5_fname)
+        dblocks = dict()
+        with h5py.File(h5_fname, "r") as h5:
+            for dgp in h5tools.get_data_group_paths(h5_fname):
+                for dbp in h5tools.get_dblock_paths(h5_fname, dgp):
+                    json_header = h5[dbp].attrs["json_header"]
+                    md5 = hashlib.md5(json_header.encode("utf8")).hexdigest()
+                    dblock = self._dblocks.get((h5_fname, dbp), None)
+                    if dblock is None or dblock[0] != md5:
+                        hio = mkh5.HeaderIO()
+                        hio.get(h5[dbp])
+                        leaves = list(self._flatten(hio.header, dbp))
+                        dblock = (
+                            md5,
+                            [slashpath for slashpath, _ in leaves],
+                            [value for _, value in leaves],
+                        )
+                    dblocks[(h5_fname, dbp)] = dblock
+
+        fingerprint = [(key[1], dblock[0]) for key, dblock in dblocks.items()]
+        index = self._indexes.get(h5_fname, None)
+        if index is not None and index[0] == fingerprint:
+            self._indexes.move_to_end(h5_fname)
+            return index[1:]
+
+        slashpaths = [path for _, paths, _ in dblocks.values() for path in paths]
+        values = [value for _, _, vals in dblocks.values() for value in vals]
+
+        # replace the file's index, this also drops deleted dblocks
+        self.clear(h5_fname)
+        if len(slashpaths) <= max_leaves:
+            self._dblocks.update(dblocks)
+            self._indexes[h5_fname] = (fingerprint, slashpaths, values)
+            self.n_leaves += len(slashpaths)
+            while self.n_leaves > max_leaves:
+                self.clear(next(iter(self._indexes)))
+        return slashpaths, values
+
+    def _flatten(self, obj, slashpath):
+        """yield (slashpath, value) for the leaves in dpath.path.paths() order"""
+        if isinstance(obj, dict):
+            for key, val in obj.items():
+                yield from self._flatten(val, f"{slashpath}/{key}")
+        elif isinstance(obj, list):
+            for idx, val in enumerate(obj):
+                yield from self._flatten(val, f"{slashpath}/{idx}")
+        else:
+            yield slashpath, obj
+
+    def clear(self, h5_fname=None):
+        """drop the index for h5_fname, default None drops all"""
+        if h5_fname is not None:
+            h5_fname = os.path.abspath(h5_fname)
+        for key in list(self._dblocks.keys()):
+            if h5_fname is None or key[0] == h5_fname:
+                del self._dblocks[key]
+        for key in list(self._indexes.keys()):
+            if h5_fname is None or key == h5_fname:
+                _, slashpaths, _ = self._indexes.pop(key)
+                self.n_leaves -= len(slashpaths)
+
+
+_HEADER_INDEX = _HeaderIndex()
+
+
 class LocDat:
     """map Kutas lab spherical coordinates and Brainsight
     .elp data files to 3-D cartesian XYZ
@@ -81,3 +81,28 @@ def MAKE_CALSTEST_H5():
     mydat = mkpy.mkh5.mkh5(CALSTEST_H5)
     mydat.reset_all()
     mydat.create_mkdata(S01["gid"], S01["eeg_f"], S01["log_f"], S01["yhdr_f"])
+
+
+# p3 single subject + cals, not IRB data
+P3 = {
+    "gid": "sub000",
+    "eeg_f": TEST_DIR("data/sub000p3.crw"),
+    "log_f": TEST_DIR("data/sub000p3.x.log"),
+    "yhdr_f": TEST_DIR("data/sub000p3.yhdr"),
+    "cal_eeg_f": TEST_DIR("data/sub000c.crw"),
+    "cal_log_f": TEST_DIR("data/sub000c.log"),
+    "cal_yhdr_f": TEST_DIR("data/sub000c.yhdr"),
+    "ytbl": TEST_DIR("data/sub000p3_codemap.ytbl"),
+}
+
+
+def MAKE_P3_H5(h5_f):
+    """reset h5_f, load the p3 data and cals, calibrate, return the mkh5"""
+    myh5 = mkpy.mkh5.mkh5(h5_f)
+    myh5.reset_all()
+    myh5.create_mkdata(P3["gid"], P3["eeg_f"], P3["log_f"], P3["yhdr_f"])
+    myh5.append_mkdata(P3["gid"], P3["cal_eeg_f"], P3["cal_log_f"], P3["cal_yhdr_f"])
+    myh5.calibrate_mkdata(
+        P3["gid"], n_points=5, cal_size=10, lo_cursor=-40, hi_cursor=40, cal_ccode=0
+    )
+    return myh5
@@ -0,0 +1,41 @@
+"""shared pytest fixtures"""
+
+import shutil
+
+import pytest
+
+from .config import P3, MAKE_P3_H5, mkpy
+
+
+@pytest.fixture(scope="session")
+def p3_h5_f(tmp_path_factory):
+    """the p3 mkh5 file with data and cals, built and calibrated once"""
+    h5_f = tmp_path_factory.mktemp("p3") / "p3.h5"
+    MAKE_P3_H5(str(h5_f))
+    return h5_f
+
+
+@pytest.fixture(scope="session")
+def p3_epochs_h5_f(p3_h5_f, tmp_path_factory):
+    """the p3 mkh5 file with p3 epochs -100 to 1000 ms set once"""
+    h5_f = tmp_path_factory.mktemp("p3_epochs") / "p3_epochs.h5"
+    shutil.copy(p3_h5_f, h5_f)
+    myh5 = mkpy.mkh5.mkh5(str(h5_f))
+    myh5.set_epochs("p3", myh5.get_event_table(P3["ytbl"]), -100, 1000)
+    return h5_f
+
+
+@pytest.fixture
+def p3_h5(p3_h5_f, tmp_path):
+    """a fresh copy of the p3 mkh5 file for the test"""
+    h5_f = tmp_path / p3_h5_f.name
+    shutil.copy(p3_h5_f, h5_f)
+    return mkpy.mkh5.mkh5(str(h5_f))
+
+
+@pytest.fixture
+def p3_epochs_h5(p3_epochs_h5_f, tmp_path):
+    """a fresh copy of the p3 mkh5 file with p3 epochs for the test"""
+    h5_f = tmp_path / p3_epochs_h5_f.name
+    shutil.copy(p3_epochs_h5_f, h5_f)
+    return mkpy.mkh5.mkh5(str(h5_f))
@@ -24,9 +24,13 @@ Patterns:
 
 
 import pdb
+import re
+import numpy as np
 from .config import TEST_DIR, IRB_DIR, GET_IRB_MKDIG, irb_data, mkpy
 from mkpy import mkh5
 from mkpy.mkh5 import CodeTagger as ct
+from mkpy.codetagger import CodePattern, EventCodes
+from mkpy import filecache
 
 
 # code lenght 1-6
@@ -171,6 +175,98 @@ def test_code_lengths():
                 # print("")
 
 
+def test_code_pattern():
+    # vectorized matches are the code-aligned regexp matches on the code string
+    rng = np.random.default_rng(0)
+    evcodes = rng.choice([1, 2, 11, 12, 21, 111, -1, -12, 1024], size=500)
+    code_str = codes_to_str(evcodes, " ")
+    delims = [m.end() for m in re.finditer(" ", code_str)]
+    for patt in [
+        r"(#1)",
+        r"(#-1)",
+        r"(#1\d)",
+        r"(#\d{2})",
+        r"(#[12])",
+        r"(1) (#2)",
+        r"(#1) 1",
+        r"(#11) \d",
+        r"(1 2) (#11)",
+        r"(?:1) (#1)",
+    ]:
+        code_patt = CodePattern(patt)
+        assert code_patt.is_vectorized
+        match_ids, starts = code_patt.find(evcodes)
+
+        regexp = re.compile(patt.replace("(#", "(").replace(")", r"\b)"))
+        matches = [
+            (i, m.start())
+            for i, m in enumerate(regexp.finditer(code_str))
+            if m.start() in delims
+        ]
+        assert match_ids.tolist() == [i for i, _ in matches]
+        assert starts.tolist() == [delims.index(pos) for _, pos in matches]
+
+    # multi-code patterns fall back to the regexp
+    for patt in [r"(#1)+", r"(#1|2)", r"(#1 2)", r"^(#1)", 1]:
+        assert not CodePattern(patt).is_vectorized
+
+
+def test_event_codes_shared():
+    # one EventCodes index serves all the patterns in a code map
+    rng = np.random.default_rng(1)
+    evcodes = rng.choice([1, 2, 11, 12, 21, 111, -1, -12, 1024], size=500)
+    ticks = np.arange(len(evcodes)) * 10
+    event_codes = EventCodes(evcodes)
+
+    myct = ct(TEST_DIR("data/simple.ytbl"))
+    for patt in [r"(#1)", r"(#1\d)", r"(#1) 1", r"(1) (#2)", r"(#2) (?!1)", r"(#1)"]:
+        if CodePattern(patt).is_vectorized:
+            shared = CodePattern(patt).find(event_codes)
+            unshared = CodePattern(patt).find(evcodes)
+            assert all((a == b).all() for a, b in zip(shared, unshared))
+        assert myct._find_evcodes(patt, ticks, evcodes, event_codes) == (
+            myct._find_evcodes(patt, ticks, evcodes)
+        )
+
+
+def test_find_evcodes_fallback():
+    # the regexp sweep finds the same matches as the vectorized patterns
+    rng = np.random.default_rng(2)
+    evcodes = rng.choice([1, 2, 11, 12, 21, 111, -1, -12, 1024], size=2000)
+    ticks = np.arange(len(evcodes)) * 10
+
+    myct = ct(TEST_DIR("data/simple.ytbl"))
+    for patt in [r"(#1)", r"(#-1)", r"(#1\d)", r"(#1) 1", r"(1) (#2)", r"(1 2) (#11)"]:
+        vectorized = myct._find_evcodes(patt, ticks, evcodes)
+        myct._compile_patt(patt)[2].is_vectorized = False
+        assert myct._find_evcodes(patt, ticks, evcodes) == vectorized
+
+
+def test_code_map_file_cache(tmp_path, monkeypatch):
+    # codemaps are parsed once per file version, in memory and on disk
+    monkeypatch.setattr(filecache, "DISK_CACHE_DIR", tmp_path / "cache")
+    filecache.clear()
+
+    cmf = tmp_path / "simple.ytbl"
+    cmf.write_text(open(TEST_DIR("data/simple.ytbl")).read())
+    code_map = ct(cmf).code_map
+    assert len(list((tmp_path / "cache").glob("*.pkl"))) == 1
+
+    # copies from memory and disk are the same, and independent
+    cached = ct(cmf).code_map
+    assert cached.equals(code_map) and cached is not code_map
+    cached.loc[0, "regexp"] = "(#999)"
+    assert ct(cmf).code_map.equals(code_map)
+    filecache.clear()
+    assert ct(cmf).code_map.equals(code_map)
+
+    # editing the file re-parses it
+    cmf.write_text(cmf.read_text().replace("columns:", "columns: ", 1) + "\n")
+    assert ct(cmf).code_map.equals(code_map)
+    assert len(list((tmp_path / "cache").glob("*.pkl"))) == 2
+    filecache.clear()
+
+
 @irb_data
 def test_irb_special_cases():
 
@@ -1,13 +1,24 @@
 import h5py
+import multiprocessing
 import numpy as np
 import os
 import pandas as pd
+import pytest
+import sys
 
 # running mkpy/tests pytest throws the error, running mkpy pytest is OK
 # mkpy >= v0.1.9 import tables here, else pandas->importlib->pathspec errors
 # import tables
 
-from .config import TEST_DIR, IRB_DIR, GET_IRB_MKDIG, CAL_ARGS, irb_data, mkpy
+from .config import (
+    TEST_DIR,
+    IRB_DIR,
+    GET_IRB_MKDIG,
+    CAL_ARGS,
+    P3,
+    irb_data,
+    mkpy,
+)
 from mkpy import mkh5
 
 
@@ -425,6 +436,36 @@ def test_pd_series_to_hdf5():
     os.remove(h5_f)
 
 
+def test_pd_series_to_hdf5_str_like(tmp_path, capsys):
+    """str-like columns convert in one go, with per-value diagnostics on failure"""
+
+    myh5 = mkh5.mkh5(str(tmp_path / "series_to_hdf5_str_like.h5"))
+
+    # whole column fast path, missing values are tagged
+    series = pd.Series(["a", "bb", None, "ccc"], name="str_col")
+    arry = myh5._pd_series_to_hdf5(series)
+    assert arry.dtype == np.dtype("S4")
+    assert arry.tolist() == [b"a", b"bb", b".NAN", b"ccc"]
+
+    # pandas infers mixed str and bytes as "mixed", the value scan rescues it
+    series = pd.Series(["a", b"bb", np.bytes_("ccc")], name="mixed_col")
+    assert pd.api.types.infer_dtype(series, skipna=True) == "mixed"
+    arry = myh5._pd_series_to_hdf5(series)
+    assert arry.tolist() == [b"a", b"bb", b"ccc"]
+
+    # non-ascii str fails the whole column, the bad value is reported
+    series = pd.Series(["a", "b\u00e9", "c"], name="bad_col")
+    with pytest.raises(UnicodeEncodeError):
+        myh5._pd_series_to_hdf5(series)
+    out = capsys.readouterr().out
+    assert "value: b\u00e9" in out
+    assert "column: bad_col" in out
+
+    # mixed numeric and str are not str-like
+    with pytest.raises(mkh5.mkh5.EpochsTableDataError):
+        myh5._pd_series_to_hdf5(pd.Series([1, "a"], name="num_str_col"))
+
+
 def test_export_epochs():
 
     MKDIG = TEST_DIR("data")
@@ -550,3 +591,564 @@ def test_export_epochs():
                 raise Exception(f"unsupported epochs export format: {fmt}")
 
             assert all(mkpy_epx_pd == from_disk)
+
+
+def test_set_epochs_checks(p3_h5):
+    """vectorized event checks and per-dblock bounds checks"""
+
+    myh5 = p3_h5
+    h5_f = myh5.h5_fname
+    event_table = myh5.get_event_table(P3["ytbl"])
+
+    # long intervals run off the ends of the dblocks
+    tmin_ms, tmax_ms = -20000, 20000
+    with pytest.warns(UserWarning, match="out of bounds"):
+        myh5.set_epochs("long", event_table, tmin_ms, tmax_ms)
+    eptbl = myh5.get_epochs_table("long")
+
+    dblock_lens = {dbp: len(myh5.get_dblock(dbp)[1]) for dbp in myh5.dblock_paths}
+    srate = event_table["dblock_srate"].unique()[0]
+    starts = event_table["match_tick"] + mkh5.mkh5._ms2samp(tmin_ms, srate)
+    stops = starts + mkh5.mkh5._ms2samp(tmax_ms - tmin_ms, srate)
+    in_bounds = (starts >= 0) & (stops <= event_table["dblock_path"].map(dblock_lens))
+    assert 0 < len(eptbl) < len(event_table)
+    assert np.array_equal(eptbl["epoch_id"], np.where(in_bounds)[0])
+
+    # event table values must agree with the dblock data
+    myh5._h5_check_events(h5_f, event_table)
+    bad_table = event_table.copy()
+    bad_table.loc[bad_table.index[-1], "crw_ticks"] += 1
+    with pytest.raises(AssertionError):
+        myh5._h5_check_events(h5_f, bad_table)
+
+
+def test_get_epochs_cache(p3_epochs_h5):
+    """cached and memory mapped epochs match freshly extracted epochs"""
+
+    myh5 = p3_epochs_h5
+    h5_f = myh5.h5_fname
+
+    epochs, attrs = myh5.get_epochs("p3")
+    cached, cached_attrs = myh5.get_epochs("p3", cache=True)
+    assert np.array_equal(epochs, cached)
+    assert attrs.keys() == cached_attrs.keys()
+    with h5py.File(h5_f, "r") as h5:
+        assert len(h5[f"{mkh5.mkh5.CACHE_PATH}/epochs"]) == 1
+
+    # cache hits, memory mapped or not
+    for cache in [True, "mmap"]:
+        hit, _ = myh5.get_epochs("p3", cache=cache)
+        assert np.array_equal(epochs, hit)
+    assert isinstance(myh5.get_epochs("p3", cache="mmap")[0], np.memmap)
+
+    columns = ["epoch_id", "MiPa", "bin"]
+    cached_pd, _ = myh5.get_epochs("p3", format="pandas", columns=columns, cache=True)
+    epochs_pd, _ = myh5.get_epochs("p3", format="pandas", columns=columns)
+    pd.testing.assert_frame_equal(epochs_pd, cached_pd)
+
+    # header changes invalidate the cache key
+    with h5py.File(h5_f, "r") as h5:
+        key = myh5._epochs_cache_key(h5, "p3", columns=None)
+    myh5.sethead([("sub000/dblock_0/cache_test", 1)])
+    with h5py.File(h5_f, "r") as h5:
+        assert key != myh5._epochs_cache_key(h5, "p3", columns=None)
+
+    with pytest.raises(ValueError):
+        myh5.get_epochs("p3", cache="yes")
+
+    myh5.clear_cache("epochs")
+    with h5py.File(h5_f, "r") as h5:
+        assert f"{mkh5.mkh5.CACHE_PATH}/epochs" not in h5
+
+
+def test_set_epochs_virtual(p3_h5):
+    """virtual epochs dataset reads the same data as get_epochs"""
+
+    myh5 = p3_h5
+    h5_f = myh5.h5_fname
+    event_table = myh5.get_event_table(P3["ytbl"])
+    myh5.set_epochs("p3", event_table, -100, 1000, virtual=True)
+    epochs, attrs = myh5.get_epochs("p3")
+    eptbl = myh5.get_epochs_table("p3")
+
+    with h5py.File(h5_f, "r") as h5:
+        vds = h5[f"{mkh5.mkh5.EPOCH_VIRTUAL_PATH}/p3"]
+        assert vds.is_virtual
+        assert vds.shape == (len(eptbl), eptbl["epoch_ticks"].unique()[0])
+        assert dict(vds.attrs) == attrs
+        v_epochs = vds[...]
+
+    for col in v_epochs.dtype.names:
+        assert np.array_equal(v_epochs[col].reshape(-1), epochs[col])
+
+    # virtual epochs are not epochs tables
+    assert myh5.get_epochs_table_names() == ["p3"]
+
+    # unmappable intervals fail before any of the tables are written
+    with pytest.raises(ValueError, match="no epochs to map"):
+        myh5.set_epochs_multi(
+            event_table, {"new": (-100, 600), "empty": (-1e7, 1e7)}, virtual=True
+        )
+    assert myh5.get_epochs_table_names() == ["p3"]
+    with h5py.File(h5_f, "r") as h5:
+        assert "new" not in h5[mkh5.mkh5.EPOCH_VIRTUAL_PATH]
+
+
+def test_get_epochs_decimate(p3_epochs_h5):
+    """decimated epochs keep the matched event and low-pass filter the EEG"""
+
+    myh5 = p3_epochs_h5
+    eptbl = myh5.get_epochs_table("p3")
+    n_epochs = len(eptbl)
+    nsamp = eptbl["epoch_ticks"].unique()[0]
+
+    epochs, _ = myh5.get_epochs("p3")
+    epochs = epochs.reshape(n_epochs, nsamp)
+    assert np.array_equal(myh5.get_epochs("p3", decimate=1)[0], epochs.reshape(-1))
+
+    for decimate in [2, 3]:
+        dec_epochs, attrs = myh5.get_epochs("p3", decimate=decimate)
+        assert attrs["decimate"] == decimate
+        dec_epochs = dec_epochs.reshape(n_epochs, -1)
+
+        # every k-th sample counting from the matched event
+        period = 1000 / eptbl["dblock_srate"].unique()[0]
+        keep = np.where((epochs[0]["match_time"] / period) % decimate == 0)[0]
+        assert np.array_equal(dec_epochs["match_time"], epochs[:, keep]["match_time"])
+        assert np.array_equal(dec_epochs["log_evcodes"], epochs[:, keep]["log_evcodes"])
+
+        # EEG is low-pass filtered across the whole dblock
+        taps = mkh5.mkh5._decimation_fir(decimate)
+        assert np.isclose(taps.sum(), 1.0)
+        e = eptbl.iloc[-1]
+        _, dblock = myh5.get_dblock(e["dblock_path"])
+        pad = len(taps) // 2
+        eeg = np.pad(dblock["MiPa"].astype("float64"), pad, "edge")
+        eeg = np.convolve(eeg, taps, mode="valid")
+        ticks = dec_epochs[-1]["dblock_ticks"]
+        assert np.allclose(dec_epochs[-1]["MiPa"], eeg[ticks], atol=1e-3)
+
+    with pytest.raises(ValueError):
+        myh5.get_epochs("p3", decimate=0)
+
+
+def test_get_span_decimate_float_eeg(tmp_path):
+    """all float EEG streams are low-pass filtered, only float16 is upcast"""
+
+    # the same EEG stored as float16, float32, float64
+    eeg = np.round(100 * np.sin(np.arange(1000) / 3.0))
+    streams = np.zeros(
+        len(eeg), dtype=[("crw_ticks", "u4"), ("f2", "f2"), ("f4", "f4"), ("f8", "f8")]
+    )
+    streams["crw_ticks"] = np.arange(len(eeg))
+    for name in ["f2", "f4", "f8"]:
+        streams[name] = eeg
+
+    with h5py.File(tmp_path / "float_eeg.h5", "w") as h5:
+        span = mkh5.mkh5._h5_get_span(
+            h5.create_dataset("dblock_0", data=streams), 100, 200, 4
+        )
+
+    assert span.dtype == np.dtype(
+        [("crw_ticks", "u4"), ("f2", "f4"), ("f4", "f4"), ("f8", "f8")]
+    )
+    assert np.array_equal(span["crw_ticks"], np.arange(100, 200))
+    assert not np.allclose(span["f2"], eeg[100:200])
+    for name in ["f4", "f8"]:
+        assert np.allclose(span[name], span["f2"])
+
+
+def test_get_epochs_where(p3_epochs_h5, monkeypatch):
+    """epochs table queries select epochs before the data are read"""
+
+    myh5 = p3_epochs_h5
+
+    where = "bin == 3 and log_flags == 0"
+    columns = ["epoch_id", "match_time", "MiPa", "bin"]
+    epoch_ids = myh5.get_epochs_table("p3").query(where)["epoch_id"]
+    assert 0 < len(epoch_ids)
+
+    epochs, _ = myh5.get_epochs("p3", format="pandas")
+    epochs = epochs[epochs["epoch_id"].isin(epoch_ids)][columns]
+    where_epochs, _ = myh5.get_epochs(
+        "p3", format="pandas", columns=columns, where=where
+    )
+    pd.testing.assert_frame_equal(epochs.reset_index(drop=True), where_epochs)
+
+    # no data streams at all
+    where_epochs, _ = myh5.get_epochs("p3", columns=["epoch_id"], where=where)
+    assert set(where_epochs["epoch_id"]) == set(epoch_ids)
+
+    # string columns compare as str, not the stored bytes
+    where = "dblock_path == 'sub000/dblock_1' and bin == 3"
+    epoch_ids = myh5.get_epochs_table("p3").query(where)["epoch_id"]
+    assert 0 < len(epoch_ids)
+    where_epochs, _ = myh5.get_epochs("p3", columns=["epoch_id"], where=where)
+    assert set(where_epochs["epoch_id"]) == set(epoch_ids)
+
+    with pytest.warns(UserWarning, match="no epochs"):
+        myh5.get_epochs("p3", where="bin == -1")
+
+    # epochs more than an epoch apart are read in separate spans
+    span_ids, span_starts, span_stops = mkh5.mkh5._get_epoch_spans(
+        np.array([500, 0, 10, 2000, 650]), 100, 100
+    )
+    assert span_ids.tolist() == [1, 0, 0, 2, 1]
+    assert span_starts.tolist() == [0, 500, 2000]
+    assert span_stops.tolist() == [110, 750, 2100]
+    span_ids, span_starts, span_stops = mkh5.mkh5._get_epoch_spans(
+        np.array([500, 0, 2000]), 100
+    )
+    assert span_ids.tolist() == [0, 0, 0]
+    assert (span_starts.tolist(), span_stops.tolist()) == ([0], [2100])
+
+    # so sparse epochs read about the samples in the epochs, not the dblock
+    epochs_all, _ = myh5.get_epochs("p3")
+    n_read = []
+    get_span = mkh5.mkh5._h5_get_span
+
+    def counting_get_span(dblock, start, stop, *args):
+        n_read.append(stop - start)
+        return get_span(dblock, start, stop, *args)
+
+    monkeypatch.setattr(mkh5.mkh5, "_h5_get_span", counting_get_span)
+    where = "epoch_id % 20 == 0"
+    sparse_epochs, _ = myh5.get_epochs("p3", where=where)
+    eptbl = myh5.get_epochs_table("p3").query(where)
+    nsamp = eptbl["epoch_ticks"].unique()[0]
+    assert sum(n_read) <= len(eptbl) * nsamp
+    assert np.array_equal(
+        sparse_epochs, epochs_all[np.isin(epochs_all["epoch_id"], eptbl["epoch_id"])]
+    )
+
+
+def test_get_epochs_n_jobs(p3_epochs_h5):
+    """parallel epochs extraction matches serial extraction"""
+
+    myh5 = p3_epochs_h5
+
+    epochs, _ = myh5.get_epochs("p3")
+    for n_jobs in [2, -1]:
+        par_epochs, _ = myh5.get_epochs("p3", n_jobs=n_jobs)
+        assert par_epochs.dtype == epochs.dtype
+        assert np.array_equal(epochs, par_epochs)
+
+    kwargs = dict(where="bin == 3", columns=["epoch_id", "MiPa"], decimate=2)
+    assert np.array_equal(
+        myh5.get_epochs("p3", **kwargs)[0], myh5.get_epochs("p3", n_jobs=3, **kwargs)[0]
+    )
+
+    with pytest.raises(ValueError):
+        myh5.get_epochs("p3", n_jobs=0)
+
+
+def _shared_epochs_mean(descriptor):
+    """worker process attaches to the shared epochs"""
+    epochs, shm = mkh5.attach_shared_epochs(descriptor)
+    mean = float(epochs["MiPa"].mean())
+    del epochs
+    shm.close()
+    return mean
+
+
+def test_get_epochs_shared_memory(p3_epochs_h5):
+    """shared memory epochs are readable from other processes"""
+
+    myh5 = p3_epochs_h5
+
+    epochs, attrs = myh5.get_epochs("p3")
+    shm_epochs, shm_attrs = myh5.get_epochs("p3", shared=True)
+    descriptor = shm_attrs.pop("shared_memory")
+    assert np.array_equal(epochs, shm_epochs)
+    assert attrs == shm_attrs == descriptor["attrs"]
+
+    with multiprocessing.Pool(2) as pool:
+        means = pool.map(_shared_epochs_mean, [descriptor] * 2)
+    assert np.allclose(means, epochs["MiPa"].mean())
+
+    mkh5.release_shared_epochs(descriptor)
+    with pytest.raises(ValueError):
+        mkh5.release_shared_epochs(descriptor)
+    with pytest.raises(ValueError):
+        myh5.get_epochs("p3", format="pandas", shared=True)
+
+    # the block is gone once released
+    del shm_epochs
+    with pytest.raises(FileNotFoundError):
+        mkh5.attach_shared_epochs(descriptor)
+
+
+def test_get_epochs_shared_memory_unavailable(p3_epochs_h5, monkeypatch):
+    """shared memory epochs fail clearly without multiprocessing.shared_memory"""
+
+    monkeypatch.delattr(multiprocessing, "shared_memory", raising=False)
+    monkeypatch.setitem(sys.modules, "multiprocessing.shared_memory", None)
+
+    with pytest.raises(RuntimeError, match="Python 3.8"):
+        p3_epochs_h5.get_epochs("p3", shared=True)
+    descriptor = {"name": "no_such_block", "shape": (1,), "dtype": "f4"}
+    for shared_func in [mkh5.attach_shared_epochs, mkh5.release_shared_epochs]:
+        with pytest.raises(RuntimeError, match="Python 3.8"):
+            shared_func(descriptor)
+
+    # the rest of get_epochs does not need it
+    epochs, _ = p3_epochs_h5.get_epochs("p3")
+    assert len(epochs) > 0
+
+
+def test_get_epochs_out(p3_epochs_h5):
+    """epochs extraction fills preallocated output arrays in place"""
+
+    myh5 = p3_epochs_h5
+    h5_f = myh5.h5_fname
+
+    epochs, _ = myh5.get_epochs("p3")
+    out = np.zeros_like(epochs)
+    for kwargs in [{}, {"n_jobs": 2}, {"cache": True}, {"cache": True}]:
+        out[...] = 0
+        out_epochs, _ = myh5.get_epochs("p3", out=out, **kwargs)
+        assert out_epochs is out
+        assert np.array_equal(epochs, out)
+
+    # wrong size, dtype, format
+    for bad_out in [out[:-1], np.zeros(len(out)), out[::2]]:
+        with pytest.raises(ValueError):
+            myh5.get_epochs("p3", out=bad_out)
+    with pytest.raises(ValueError):
+        myh5.get_epochs("p3", format="pandas", out=out)
+
+    # datablock slices
+    with h5py.File(h5_f, "r") as h5:
+        dblock = h5["sub000/dblock_0"]
+        slicer = mkh5.mkh5._get_dblock_slices_at(np.array([100, 200]), 10, 50)
+        slices = mkh5.mkh5._h5_get_slices_from_datablock(dblock, slicer)
+        assert np.array_equal(slices[:, 1], dblock[190:239])
+        slices_out = np.zeros_like(slices)
+        mkh5.mkh5._h5_get_slices_from_datablock(dblock, slicer, out=slices_out)
+        assert np.array_equal(slices, slices_out)
+
+
+def test_average(p3_epochs_h5, tmp_path):
+    """streaming averages match averaging the extracted single trials"""
+
+    avg_f = str(tmp_path / "average.avg")
+    myh5 = p3_epochs_h5
+
+    erps = myh5.average("p3", by=["bin"], avg_f=avg_f)
+    groups = erps["groups"]
+    n_groups, n_samps, n_chans = erps["mean"].shape
+    assert n_groups == len(groups) and n_chans == len(erps["channels"])
+    assert groups["n_excluded"].sum() > 0
+
+    # reference: drop epochs with pygarv or log_flags anywhere in the interval
+    epochs, _ = myh5.get_epochs("p3", format="pandas")
+    artifacts = (epochs[["pygarv", "log_flags"]] != 0).any(axis=1)
+    bad_ids = epochs.loc[artifacts, "epoch_id"].unique()
+    epochs = epochs[~epochs["epoch_id"].isin(bad_ids)]
+    for group, row in groups.iterrows():
+        bin_epochs = epochs[epochs["bin"] == row["bin"]]
+        assert row["n_epochs"] == bin_epochs["epoch_id"].nunique()
+        by_time = bin_epochs.groupby("match_time")[erps["channels"]]
+        assert np.array_equal(by_time.mean().index, erps["times"])
+        assert np.allclose(by_time.mean(), erps["mean"][group])
+        assert np.allclose(by_time.var(), erps["var"][group])
+
+    # one 512 byte header + int16 data record per group
+    assert os.path.getsize(avg_f) == n_groups * (512 + 2 * 256 * 2 * n_chans)
+
+    erps = myh5.average("p3", by=["bin"], exclude=None)
+    assert erps["groups"]["n_excluded"].sum() == 0
+    assert erps["groups"]["n_epochs"].sum() == len(myh5.get_epochs_table("p3"))
+
+    with pytest.raises(ValueError):
+        myh5.average("p3", by=["no_such_column"])
+
+
+def test_measure(p3_epochs_h5):
+    """window measures match measuring the extracted single trials"""
+
+    myh5 = p3_epochs_h5
+
+    windows = {"P2": (150, 250), "N400": (300, 500)}
+    measures = myh5.measure("p3", windows, peak={"P2": "max", "N400": "min"})
+    n_epochs = len(myh5.get_epochs_table("p3"))
+    assert len(measures) == n_epochs * len(windows) * measures["channel"].nunique()
+
+    epochs, _ = myh5.get_epochs("p3", format="pandas")
+    for name, (tmin_ms, tmax_ms) in windows.items():
+        in_window = epochs["match_time"].between(tmin_ms, tmax_ms)
+        by_epoch = epochs[in_window].groupby("epoch_id")["MiPa"]
+        peak_idxs = by_epoch.idxmax() if name == "P2" else by_epoch.idxmin()
+        window = measures.query("window == @name and channel == 'MiPa'")
+        assert np.allclose(by_epoch.mean(), window["mean"])
+        assert np.allclose(epochs.loc[peak_idxs, "MiPa"], window["peak"])
+        assert np.array_equal(
+            epochs.loc[peak_idxs, "match_time"], window["peak_latency"]
+        )
+
+    with pytest.raises(ValueError):
+        myh5.measure("p3", {"late": (900, 1100)})
+    with pytest.raises(ValueError):
+        myh5.measure("p3", windows, peak="abs")
+
+    # windows between samples, 4 ms apart at 250 Hz
+    with pytest.raises(ValueError, match="window x .* no samples at 250"):
+        myh5.measure("p3", {"x": (301, 302)})
+
+
+def test_set_epochs_multi(p3_h5, monkeypatch):
+    """several epochs tables in one pass are the same as one at a time"""
+
+    myh5 = p3_h5
+    event_table = myh5.get_event_table(P3["ytbl"])
+
+    intervals = {"p3_short": (-100, 600), "p3_long": (-500, 1500)}
+    myh5.set_epochs_multi(event_table, intervals)
+    for name, (tmin_ms, tmax_ms) in intervals.items():
+        myh5.set_epochs(name + "_1", event_table, tmin_ms, tmax_ms)
+        epochs_table = myh5.get_epochs_table(name)
+        pd.testing.assert_frame_equal(epochs_table, myh5.get_epochs_table(name + "_1"))
+        attrs = myh5.get_epochs(name, columns=["epoch_id"])[1]
+        assert (attrs["tmin_ms"], attrs["tmax_ms"]) == (tmin_ms, tmax_ms)
+
+    # all or nothing
+    with pytest.raises(RuntimeError):
+        myh5.set_epochs_multi(event_table, {"new": (-100, 600), "p3_long": (0, 1)})
+    with pytest.raises(ValueError):
+        myh5.set_epochs_multi(event_table, {"new": (-100, 600), "bad": (0, 1)})
+    assert "new" not in myh5.get_epochs_table_names()
+
+    # the interval columns of each table are checked as stored
+    checked = []
+    check_intervals = mkh5.mkh5._check_epochs_intervals
+
+    def recording_check(self, epochs_table):
+        checked.append(epochs_table.copy())
+        check_intervals(self, epochs_table)
+
+    monkeypatch.setattr(mkh5.mkh5, "_check_epochs_intervals", recording_check)
+    intervals = {"checked_short": (-100, 600), "checked_long": (-500, 1500)}
+    myh5.set_epochs_multi(event_table, intervals)
+    assert len(checked) == len(intervals)
+    for name, checked_table in zip(intervals, checked):
+        epochs_table = myh5.get_epochs_table(name)
+        for col in ["epoch_id", "epoch_ticks", "epoch_match_tick_delta", "diti_len"]:
+            assert np.array_equal(checked_table[col], epochs_table[col])
+
+    bad_table = checked[0].copy()
+    bad_table["epoch_ticks"][0] += 1
+    with pytest.raises(ValueError, match="epoch_ticks"):
+        myh5._check_epochs_intervals(bad_table)
+
+
+def test_set_epochs_compact(p3_h5):
+    """compact string columns read back the same and take less space"""
+
+    myh5 = p3_h5
+    h5_f = myh5.h5_fname
+    event_table = myh5.get_event_table(P3["ytbl"])
+    myh5.set_epochs("p3", event_table, -100, 1000)
+    myh5.set_epochs("p3_compact", event_table, -100, 1000, compact=True)
+
+    pd.testing.assert_frame_equal(
+        myh5.get_epochs_table("p3"), myh5.get_epochs_table("p3_compact")
+    )
+    epochs, attrs = myh5.get_epochs("p3", format="pandas")
+    epochs_compact, attrs_compact = myh5.get_epochs("p3_compact", format="pandas")
+    pd.testing.assert_frame_equal(epochs, epochs_compact)
+    assert attrs == attrs_compact
+
+    with h5py.File(h5_f, "r") as h5:
+        epochs_table = h5[f"{myh5.EPOCH_TABLES_PATH}/p3"]
+        compact_table = h5[f"{myh5.EPOCH_TABLES_PATH}/p3_compact"]
+        assert compact_table.dtype["dblock_path"].kind == "u"
+        assert compact_table.dtype.itemsize < epochs_table.dtype.itemsize
+
+
+def test_get_epochs_artifacts(p3_epochs_h5):
+    """epoch artifact summaries match grouping the extracted epochs"""
+
+    myh5 = p3_epochs_h5
+    h5_f = myh5.h5_fname
+
+    # tag some samples in one dblock as if pygarv tests 0 and 2 failed
+    dbp = "sub000/dblock_1"
+    tests = [
+        [{"test": "ppa"}, {"tag": "blink"}, {"stream": "lle"}],
+        [{"test": "maxflat"}, {"tag": "flat"}, {"stream": "MiPa"}],
+        [{"test": "ppa"}, {"tag": "drift"}, {"stream": "MiPf"}],
+    ]
+    myh5.sethead([(f"{dbp}/pygarv", {"name": "pygarv", "tests": tests})])
+    with h5py.File(h5_f, "r+") as h5:
+        pygarv = h5[dbp]["pygarv"]
+        pygarv[1000:1010] = 1
+        pygarv[5000] = 4
+        h5[dbp]["pygarv"] = pygarv
+
+    artifacts = myh5.get_epochs_artifacts("p3")
+    epochs_table = myh5.get_epochs_table("p3")
+    assert np.array_equal(artifacts["epoch_id"], epochs_table["epoch_id"])
+    assert artifacts["pygarv_any"].sum() > 0
+
+    epochs, _ = myh5.get_epochs("p3", format="pandas")
+    by_epoch = epochs.groupby("epoch_id")
+    pygarv = by_epoch["pygarv"].agg(np.bitwise_or.reduce)
+    assert np.array_equal(artifacts["pygarv"], pygarv.loc[artifacts["epoch_id"]])
+    match_flags = epochs.query("match_time == 0").set_index("epoch_id")["log_flags"]
+    assert np.array_equal(
+        artifacts["log_flags"], match_flags.loc[artifacts["epoch_id"]]
+    )
+    labels = {
+        0: [],
+        1: ["ppa lle blink"],
+        4: ["ppa MiPf drift"],
+        5: ["ppa lle blink", "ppa MiPf drift"],
+    }
+    assert set(artifacts["pygarv"]) >= set([0, 1, 4])
+    for mask, fired in zip(artifacts["pygarv"], artifacts["pygarv_tests"]):
+        assert fired == labels[mask]
+
+
+def test_get_epoch(p3_epochs_h5):
+    """random access epochs match get_epochs and come from the chunk cache"""
+
+    myh5 = p3_epochs_h5
+
+    epochs, attrs = myh5.get_epochs("p3")
+    epoch_ids = myh5.get_epochs_table("p3")["epoch_id"].to_numpy()
+    some_ids = [epoch_ids[-1], epoch_ids[3], epoch_ids[0]]
+    for epoch_id in some_ids:
+        epoch, epoch_attrs = myh5.get_epoch("p3", epoch_id)
+        assert np.array_equal(epoch, epochs[epochs["epoch_id"] == epoch_id])
+        assert epoch_attrs == attrs
+
+    # repeat fetches are served from the cache
+    n_cached = len(mkh5._CHUNK_CACHE._entries)
+    some_epochs, _ = myh5.get_epoch("p3", some_ids)
+    assert len(mkh5._CHUNK_CACHE._entries) == n_cached
+    assert np.array_equal(some_epochs["epoch_id"], np.repeat(some_ids, len(epoch)))
+    cached_nbytes = [nbytes for _, nbytes in mkh5._CHUNK_CACHE._entries.values()]
+    assert mkh5._CHUNK_CACHE.nbytes == sum(cached_nbytes)
+
+    # re-caching a key replaces its bytes in the tally
+    cache = mkh5._DblockChunkCache()
+    cache.put("some.h5", "chunk", None, 10, 100)
+    cache.put("some.h5", "chunk", None, 20, 100)
+    assert len(cache._entries) == 1 and cache.nbytes == 20
+
+    epochs_pd, _ = myh5.get_epochs("p3", format="pandas", columns=["epoch_id", "MiPa"])
+    epoch_pd, _ = myh5.get_epoch(
+        "p3", epoch_ids[3], format="pandas", columns=["epoch_id", "MiPa"]
+    )
+    pd.testing.assert_frame_equal(
+        epoch_pd,
+        epochs_pd[epochs_pd["epoch_id"] == epoch_ids[3]].reset_index(drop=True),
+    )
+
+    # changing the file drops its cached chunks
+    myh5.sethead([("sub000/dblock_0/note", "changed")])
+    myh5.get_epoch("p3", epoch_ids[0])
+    assert len(mkh5._CHUNK_CACHE._entries) < n_cached
+
+    with pytest.raises(ValueError):
+        myh5.get_epoch("p3", -1)
@@ -7,10 +7,20 @@ import uuid
 import os
 from pathlib import Path
 import pytest
+import h5py
 
 import pandas as pd
-from .config import TEST_DIR, TEST_H5, IRB_DIR, GET_IRB_MKDIG, irb_data, mkpy
-from mkpy import mkh5
+from .config import (
+    TEST_DIR,
+    TEST_H5,
+    IRB_DIR,
+    GET_IRB_MKDIG,
+    P3,
+    irb_data,
+    mkpy,
+)
+from mkpy import mkh5, events
+from mkpy.codetagger import CodeTagger
 
 
 @pytest.mark.parametrize("path_type", [str, Path])
@@ -346,3 +356,92 @@ def test_p3_yaml_codemap_ccode(codemap):
         assert sha256 == events[codemap]["sha256"]
 
     assert all(bin_desc == pd.read_csv(bindesc_f, sep="\t"))
+
+
+def test_event_table_n_jobs(p3_h5):
+    """parallel event tables are the same as serial"""
+
+    myh5 = p3_h5
+    h5_f = myh5.h5_fname
+
+    event_table = myh5.get_event_table(P3["ytbl"])
+    for n_jobs in [2, -1]:
+        assert event_table.equals(myh5.get_event_table(P3["ytbl"], n_jobs=n_jobs))
+
+    code_map = CodeTagger(P3["ytbl"]).code_map.set_index("Index")
+    yhdx_f = TEST_DIR("data/cor01.yhdx")
+    assert events.build_event_table(h5_f, code_map, yhdx_f).equals(
+        events.build_event_table(h5_f, code_map, yhdx_f, n_jobs=2)
+    )
+
+    for n_jobs in [0, -2, 1.5]:
+        with pytest.raises(ValueError):
+            myh5.get_event_table(P3["ytbl"], n_jobs=n_jobs)
+
+
+def test_event_table_cache(p3_h5, capsys):
+    """cached event tables are the same and re-sweep only what changed"""
+
+    myh5 = p3_h5
+    h5_f = myh5.h5_fname
+    yhdx_f = TEST_DIR("data/cor01.yhdx")
+    ccode_ytbl = TEST_DIR("data/sub000p3_codemap_ccode.ytbl")
+
+    event_table = myh5.get_event_table(P3["ytbl"], yhdx_f)
+    n_dblocks = capsys.readouterr().out.count("searching codes in:")
+
+    # first call sweeps and caches, second call sweeps nothing
+    for n_jobs in [1, 2]:
+        cached = myh5.get_event_table(P3["ytbl"], yhdx_f, n_jobs=n_jobs, cache=True)
+        assert event_table.equals(cached)
+    assert capsys.readouterr().out.count("searching codes in:") == n_dblocks
+
+    with h5py.File(h5_f, "r") as h5:
+        assert len(h5[f"{mkh5.mkh5.CACHE_PATH}/event_table"]) == n_dblocks
+
+    # a different code map or header map is swept anew
+    for code_map_f, header_map_f in [(ccode_ytbl, yhdx_f), (P3["ytbl"], None)]:
+        event_table = myh5.get_event_table(code_map_f, header_map_f)
+        capsys.readouterr()
+        for _ in range(2):
+            cached = myh5.get_event_table(code_map_f, header_map_f, cache=True)
+            assert event_table.equals(cached)
+        assert capsys.readouterr().out.count("searching codes in:") == n_dblocks
+
+    myh5.clear_cache("event_table")
+    with h5py.File(h5_f, "r") as h5:
+        assert f"{mkh5.mkh5.CACHE_PATH}/event_table" not in h5
+
+
+def test_event_counts(p3_h5):
+    """event code census from the log_evcodes agrees with the dblocks"""
+
+    myh5 = p3_h5
+    h5_f = myh5.h5_fname
+
+    events = []
+    with h5py.File(h5_f, "r") as h5:
+        for dbp in myh5.dblock_paths:
+            dblock = h5[dbp][...]
+            dblock = pd.DataFrame(dblock[dblock["log_evcodes"] != 0])
+            events.append(dblock.assign(dblock_path=dbp, data_group=dbp.split("/")[0]))
+    events = pd.concat(events, ignore_index=True)
+
+    for by in [["data_group", "log_ccodes"], ["dblock_path"], []]:
+        counts = myh5.event_counts(by=by)
+        expected = events.groupby(by + ["log_evcodes"])["dblock_ticks"]
+        assert (counts["count"] == expected.size().to_numpy()).all()
+        assert (counts["first_dblock_ticks"] == expected.first().to_numpy()).all()
+        assert (counts["last_dblock_ticks"] == expected.last().to_numpy()).all()
+        assert counts["log_evcodes"].dtype == events["log_evcodes"].dtype
+
+    # intervals within each dblock
+    counts = myh5.event_counts(by=["dblock_path"])
+    iei = events.groupby(["dblock_path", "log_evcodes"])["dblock_ticks"].apply(
+        lambda ticks: np.diff(ticks).mean() if len(ticks) > 1 else np.nan
+    )
+    assert np.allclose(counts["iei_mean"], iei.to_numpy(), equal_nan=True)
+
+    for by in [["log_evcodes"], ["data_group", "data_group"], ["crw_ticks"]]:
+        with pytest.raises(ValueError):
+            myh5.event_counts(by=by)
@@ -1,4 +1,7 @@
-from .config import mkpy
+import copy
+
+from .config import mkpy, TEST_DIR
+from mkpy import dpath
 from mkpy.mkh5 import mkh5
 
 
@@ -54,3 +57,111 @@ def test_HeaderIO_update_from_dict_default():
 
     # --------------------------- CHECK ---------------------------------
     assert hio._header == {**base_dict, "key1": "A", "key2": "B", "key3": "D"}
+
+
+def test_HeaderIO_slice_headers():
+
+    # --------------------------- SETUP ---------------------------------
+    headers = [
+        {
+            "runsheet": {"age": 22, "+note": "x", "scores": [1, 2]},
+            "streams": [{"name": "MiPf"}],
+            "1": {"a": 3},
+        },
+        {"runsheet": {"age": 31}, "streams": []},
+    ]
+    hio = mkh5.HeaderIO()
+    hio._slicer = {
+        "age": ["runsheet", "age"],
+        "note": ["runsheet", "+note"],
+        "chan_0": ["streams", 0, "name"],
+        "chan_5": ["streams", 5, "name"],
+        "chan_00": ["streams", "00", "name"],
+        "score_1": ["runsheet", "scores", "1"],
+        "score_neg": ["runsheet", "scores", "-1"],
+        "one_a": [1, "a"],
+        "runsheet": ["runsheet"],
+        "any_age": ["*", "age"],
+        "missing": ["runsheet", "nope"],
+        "too_deep": ["runsheet", "age", "x"],
+    }
+
+    # ---------------------------- RUN ----------------------------------
+    slices = hio.slice_headers(headers)
+
+    # --------------------------- CHECK ---------------------------------
+    # same as slicing each header with dpath, NaN for missing keys
+    for header, header_slices in zip(headers, slices):
+        dpath_slices = []
+        for k, v in hio._slicer.items():
+            try:
+                dpath_slices.append((k, dpath.util.get(header, v)))
+            except KeyError:
+                dpath_slices.append((k, float("NaN")))
+        assert str(dpath_slices) == str(header_slices)
+
+    assert [dict(s)["age"] for s in slices] == [22, 31]
+    assert [dict(s)["any_age"] for s in slices] == [22, 31]
+    assert dict(slices[0])["chan_0"] == "MiPf"
+    for key in ["note", "missing"]:
+        assert all(dict(s)[key] != dict(s)[key] for s in slices)  # NaN
+
+
+def test_HeaderIO_update_from_slashpaths():
+
+    # --------------------------- SETUP ---------------------------------
+    base_types = mkh5.HeaderIO._mkh5_header_types
+    base_dict = {key: item() for key, item in base_types.items()}
+
+    hio = mkh5.HeaderIO()
+    hio._header = {
+        **base_dict,
+        "streams": {"MiPa": {"calibrated": False}, "lle": {"calibrated": False}},
+        "runsheet": {"scores": [1, 2]},
+    }
+
+    # ---------------------------- RUN ----------------------------------
+    hio._update_from_slashpaths(
+        [
+            ("streams/MiPa/calibrated", True),  # existing key
+            ("/streams/MiPa/cals/scale_by", 1.5),  # new keys
+            ("streams/*/calibrated", 1),  # glob
+            ("runsheet/scores/1", 3),  # list index
+        ]
+    )
+
+    # --------------------------- CHECK ---------------------------------
+    assert hio._header["streams"] == {
+        "MiPa": {"calibrated": 1, "cals": {"scale_by": 1.5}},
+        "lle": {"calibrated": 1},
+    }
+    assert hio._header["runsheet"] == {"scores": [1, 3]}
+
+    # numeric keys on new paths are created as dpath.util.new() does
+    for slashpath in ["/01/a/0", "runsheet/new/0", "runsheet/0/b"]:
+        expected = copy.deepcopy(hio._header)
+        dpath.util.new(expected, slashpath, 5)
+        hio._update_from_slashpaths([(slashpath, 5)])
+        assert hio._header == expected
+
+
+def test_HeaderIO_load_yhdr_cache(tmp_path):
+
+    # --------------------------- SETUP ---------------------------------
+    yhdr_f = tmp_path / "sub000p3.yhdr"
+    yhdr_f.write_text(open(TEST_DIR("data/sub000p3.yhdr")).read())
+    hio = mkh5.HeaderIO()
+
+    # ---------------------------- RUN ----------------------------------
+    yhdr = hio._load_yhdr(str(yhdr_f))
+    yhdr["apparatus"]["name"] = "changed"
+    cached = hio._load_yhdr(str(yhdr_f))
+    yhdr_f.write_text(yhdr_f.read_text() + "\n# edited\n")
+    edited = hio._load_yhdr(str(yhdr_f))
+
+    # --------------------------- CHECK ---------------------------------
+    assert cached["apparatus"]["name"] == "apparatus"
+    assert cached["yhdr_file_md5"] != edited["yhdr_file_md5"]
+    for yhdr in [cached, edited]:
+        yhdr.pop("yhdr_file_md5")
+    assert cached == edited
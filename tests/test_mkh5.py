@@ -290,6 +290,51 @@ def test_get_set_head():
     os.remove(TEST_H5)
 
 
+def test_gethead_index_updates(monkeypatch):
+    """the cached header index follows header edits and new data"""
+
+    mydat = mkh5.mkh5(TEST_H5)
+    mydat.reset_all()
+    mydat.create_mkdata(S01["gid"], S01["eeg_f"], S01["log_f"], S01["yhdr_f"])
+    n_head = len(mydat.gethead(".+"))
+
+    # same size edits are seen
+    for val in ["A", "B"]:
+        mydat.sethead([("S01/dblock_0/runsheet/index_test", val)])
+        index_test = mydat.gethead("index_test")
+        assert index_test == [("S01/dblock_0/runsheet/index_test", val)]
+    assert len(mydat.gethead(".+")) == n_head + 1
+
+    # so are other mkh5 instances and new files with the same name
+    mydat.reset_all()
+    assert mkh5.mkh5(TEST_H5).gethead(".+") is None
+    mydat.create_mkdata(S01["gid"], S01["eeg_f"], S01["log_f"], S01["yhdr_f"])
+    assert len(mydat.gethead(".+")) == n_head
+
+    # relative and absolute paths to the file share one index
+    mkh5._HEADER_INDEX.clear()
+    rel_dat = mkh5.mkh5(os.path.relpath(TEST_H5))
+    assert len(rel_dat.gethead(".+")) == n_head
+    mydat.sethead([("S01/dblock_0/runsheet/index_test", "C")])
+    assert rel_dat.gethead("index_test") == [("S01/dblock_0/runsheet/index_test", "C")]
+    mkh5.mkh5(os.path.abspath(TEST_H5)).gethead(".+")
+    assert list(mkh5._HEADER_INDEX._indexes) == [os.path.abspath(TEST_H5)]
+    rel_dat.sethead([("S01/dblock_0/runsheet/index_test", "D")])
+    assert mydat.gethead("index_test") == [("S01/dblock_0/runsheet/index_test", "D")]
+    mydat.reset_all()
+    mydat.create_mkdata(S01["gid"], S01["eeg_f"], S01["log_f"], S01["yhdr_f"])
+
+    # files over the size limit are looked up but not kept
+    mkh5._HEADER_INDEX.clear()
+    monkeypatch.setattr(mkh5.mkh5, "HEADER_INDEX_LEAVES", n_head - 1)
+    assert len(mydat.gethead(".+")) == n_head
+    assert mkh5._HEADER_INDEX.n_leaves == 0
+    monkeypatch.setattr(mkh5.mkh5, "HEADER_INDEX_LEAVES", n_head)
+    assert len(mydat.gethead(".+")) == n_head
+    assert mkh5._HEADER_INDEX.n_leaves == n_head
+    os.remove(TEST_H5)
+
+
 # ------------------------------------------------------------
 # test calibration to uV
 